@@ -0,0 +1,49 @@
+"""Add partial indexes for the daily cron sweeps on subscriptions
+
+Revision ID: add_cron_sweep_indexes_20261016
+Revises: add_item_id_trigger_20261016
+Create Date: 2026-10-16
+
+Partial indexes matching the WHERE clauses of the two daily cron queries, so
+they read only the candidate rows instead of scanning subscriptions:
+- cron/check_inactive_subscribers.py: inactive paying subscribers
+- cron/process_scheduled_deletions.py: accounts scheduled for deletion
+
+Built CONCURRENTLY so the table stays writable while they build.
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'add_cron_sweep_indexes_20261016'
+down_revision = 'add_item_id_trigger_20261016'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Create the inactivity-sweep and scheduled-deletion partial indexes."""
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction
+    with op.get_context().autocommit_block():
+        op.execute("""
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_subscriptions_inactive_sweep
+            ON subscriptions (last_activity, current_period_end)
+            INCLUDE (user_id, tier, last_inactivity_email_sent)
+            WHERE tier <> 'free'
+                AND status = 'active'
+                AND is_complimentary = FALSE
+                AND COALESCE(inactivity_emails_opted_out, FALSE) = FALSE;
+        """)
+
+        op.execute("""
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_subscriptions_scheduled_deletion
+            ON subscriptions (deletion_scheduled_for)
+            WHERE deletion_type = 'scheduled'
+                AND deletion_scheduled_for IS NOT NULL;
+        """)
+
+
+def downgrade():
+    """Drop the cron sweep indexes."""
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_subscriptions_scheduled_deletion;")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_subscriptions_inactive_sweep;")
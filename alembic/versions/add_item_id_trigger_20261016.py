@@ -0,0 +1,44 @@
+"""Fill items.item_id from the primary key on insert
+
+Revision ID: add_item_id_trigger_20261016
+Revises: add_inactivity_tracking_20260125
+Create Date: 2026-10-16
+
+New items use their database id as item_id (Google Sheets compatibility:
+Column B matches Column A). A BEFORE INSERT trigger fills item_id when it's
+empty, so creating an item no longer needs a follow-up UPDATE.
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'add_item_id_trigger_20261016'
+down_revision = 'add_inactivity_tracking_20260125'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Create the item_id trigger function and BEFORE INSERT trigger on items."""
+    op.execute("""
+        CREATE OR REPLACE FUNCTION set_item_id_from_pk() RETURNS trigger AS $$
+        BEGIN
+            NEW.item_id := NEW.id::text;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+
+    op.execute("DROP TRIGGER IF EXISTS items_set_item_id ON items;")
+    op.execute("""
+        CREATE TRIGGER items_set_item_id
+        BEFORE INSERT ON items
+        FOR EACH ROW
+        WHEN (NEW.item_id IS NULL OR NEW.item_id = '')
+        EXECUTE FUNCTION set_item_id_from_pk();
+    """)
+
+
+def downgrade():
+    """Remove the item_id trigger and its function."""
+    op.execute("DROP TRIGGER IF EXISTS items_set_item_id ON items;")
+    op.execute("DROP FUNCTION IF EXISTS set_item_id_from_pk();")
@@ -0,0 +1,46 @@
+"""Drop the autocreate rate-limit counter columns from subscriptions
+
+Revision ID: drop_autocreate_counters_20261016
+Revises: add_cron_sweep_indexes_20261016
+Create Date: 2026-10-16
+
+Autocreate call counters now live in Redis (app/utils/rate_limits_redis.py), so
+the columns added by migrations/add_autocreate_rate_limits.sql are no longer
+read or written. Counts aren't carried over: every user's autocreate quota
+starts fresh at deploy.
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'drop_autocreate_counters_20261016'
+down_revision = 'add_cron_sweep_indexes_20261016'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Drop the autocreate counter columns and their reset-time indexes."""
+    op.execute("DROP INDEX IF EXISTS idx_subscriptions_autocreate_hourly_reset;")
+    op.execute("DROP INDEX IF EXISTS idx_subscriptions_autocreate_daily_reset;")
+    op.execute("ALTER TABLE subscriptions DROP COLUMN IF EXISTS autocreate_hourly_reset_at;")
+    op.execute("ALTER TABLE subscriptions DROP COLUMN IF EXISTS autocreate_daily_reset_at;")
+    op.execute("ALTER TABLE subscriptions DROP COLUMN IF EXISTS autocreate_calls_this_hour;")
+    op.execute("ALTER TABLE subscriptions DROP COLUMN IF EXISTS autocreate_calls_today;")
+
+
+def downgrade():
+    """Re-add the autocreate counter columns (empty) and their indexes."""
+    op.execute("ALTER TABLE subscriptions ADD COLUMN IF NOT EXISTS autocreate_calls_today INTEGER NOT NULL DEFAULT 0;")
+    op.execute("ALTER TABLE subscriptions ADD COLUMN IF NOT EXISTS autocreate_calls_this_hour INTEGER NOT NULL DEFAULT 0;")
+    op.execute("ALTER TABLE subscriptions ADD COLUMN IF NOT EXISTS autocreate_daily_reset_at TIMESTAMP WITH TIME ZONE;")
+    op.execute("ALTER TABLE subscriptions ADD COLUMN IF NOT EXISTS autocreate_hourly_reset_at TIMESTAMP WITH TIME ZONE;")
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS idx_subscriptions_autocreate_daily_reset
+        ON subscriptions(autocreate_daily_reset_at)
+        WHERE autocreate_daily_reset_at IS NOT NULL;
+    """)
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS idx_subscriptions_autocreate_hourly_reset
+        ON subscriptions(autocreate_hourly_reset_at)
+        WHERE autocreate_hourly_reset_at IS NOT NULL;
+    """)
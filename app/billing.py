@@ -471,8 +471,9 @@ def handle_subscription_created(db: Session, stripe_subscription):
     db.commit()
     logger.info(f"Updated subscription for user {user_id}: tier={tier}, status={subscription.status}")
 
-    # Track subscription created event
-    from app.utils.posthog_client import track_event
+    # Track subscription created event; drop the cached tier first so it's enriched with the new one
+    from app.utils.posthog_client import forget_user, track_event
+    forget_user(user_id)
     track_event(user_id, 'subscription_created', {
         'tier': tier,
         'billing_period': billing_period
@@ -534,8 +535,9 @@ def handle_subscription_updated(db: Session, stripe_subscription):
     db.commit()
     logger.info(f"Updated subscription for user {subscription.user_id}: tier={tier}, status={subscription.status}, cancel_at_period_end={stripe_subscription['cancel_at_period_end']}, cancel_at={stripe_subscription.get('cancel_at')}")
 
-    # Track subscription updated event
-    from app.utils.posthog_client import track_event
+    # Track subscription updated event; drop the cached tier first so it's enriched with the new one
+    from app.utils.posthog_client import forget_user, track_event
+    forget_user(subscription.user_id)
 
     # Determine what changed
     tier_changed = old_tier != tier
@@ -642,17 +644,6 @@ def handle_subscription_deleted(db: Session, stripe_subscription):
         subscription.last_active_routine_id = active_routine_id
 
         logger.info(f"User {subscription.user_id} in unplugged mode - 90 days until data deletion")
-
-        # Track subscription paused event
-        from app.utils.posthog_client import track_event
-        track_event(subscription.user_id, 'subscription_paused', {
-            'tier': 'free',
-            'pause_reason': 'user_initiated'
-        })
-        track_event(subscription.user_id, 'subscription_canceled', {
-            'tier': 'free',
-            'cancellation_type': 'pause'
-        })
     else:
         # Automated cancellation (payment failure, etc.) - just downgrade to free
         subscription.tier = 'free'
@@ -664,15 +655,29 @@ def handle_subscription_deleted(db: Session, stripe_subscription):
 
         logger.info(f"Subscription auto-canceled (reason: {cancellation_reason or 'unknown'}) for user {subscription.user_id} - downgraded to free tier")
 
+    db.commit()
+
+    # Track after the commit, with the cached tier dropped, so events don't carry the old tier
+    from app.utils.posthog_client import forget_user, track_event
+    forget_user(subscription.user_id)
+
+    if cancellation_reason == 'cancellation_requested':
+        # Track subscription paused event
+        track_event(subscription.user_id, 'subscription_paused', {
+            'tier': 'free',
+            'pause_reason': 'user_initiated'
+        })
+        track_event(subscription.user_id, 'subscription_canceled', {
+            'tier': 'free',
+            'cancellation_type': 'pause'
+        })
+    else:
         # Track subscription canceled event (automated)
-        from app.utils.posthog_client import track_event
         track_event(subscription.user_id, 'subscription_canceled', {
             'tier': 'free',
             'cancellation_type': 'instant_delete'
         })
 
-    db.commit()
-
 
 def handle_payment_succeeded(db: Session, invoice):
     """Handle successful payment"""
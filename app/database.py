@@ -1,4 +1,5 @@
 from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, scoped_session
 from sqlalchemy.pool import StaticPool
 import os
@@ -15,13 +16,20 @@ DATABASE_URL = os.getenv('DATABASE_URL')
 if not DATABASE_URL:
     raise ValueError("DATABASE_URL environment variable must be set")
 
+# psycopg2: send executemany() UPDATE/DELETE batches via execute_batch, in addition to
+# the default multi-row VALUES batching for Core INSERTs (fewer round-trips per batch)
+engine_options = {}
+if make_url(DATABASE_URL).get_driver_name() == 'psycopg2':
+    engine_options['executemany_mode'] = 'values_plus_batch'
+
 # Create engine with connection pooling
 engine = create_engine(
     DATABASE_URL,
     pool_size=10,
     max_overflow=20,
     pool_pre_ping=True,  # Validate connections before use
-    echo=os.getenv('SQL_DEBUG', 'False').lower() == 'true'  # SQL logging
+    echo=os.getenv('SQL_DEBUG', 'False').lower() == 'true',  # SQL logging
+    **engine_options
 )
 
 # Session factory
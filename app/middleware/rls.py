@@ -35,6 +35,8 @@ from sqlalchemy import event, text
 from sqlalchemy.orm import Session
 from typing import Optional
 
+from app.utils.posthog_client import get_posthog_distinct_id
+
 logger = logging.getLogger(__name__)
 
 
@@ -63,6 +65,10 @@ def init_rls_middleware(app, db_engine):
             g.current_user_id = current_user.id
             logger.debug(f"RLS: User context set for user_id={current_user.id}")
 
+            # PostHog distinct_id for this request's events, from the already-loaded user
+            # (see request_distinct_id in posthog_client)
+            g.posthog_distinct_id = get_posthog_distinct_id(current_user.id, current_user.email)
+
             # Also set PostgreSQL session variable for RLS policies (if enabled)
             # This allows database-level RLS to work alongside application-level filtering
             try:
@@ -42,16 +42,9 @@ class ItemRepository(BaseRepository):
         """Create item from Google Sheets format data."""
         item_data = self._from_sheets_format(sheets_data)
         
-        # Create the item first
-        item = self.create(**item_data)
-        
-        # If item_id is empty, set it to the database ID for compatibility
-        if not item.item_id:
-            item.item_id = str(item.id)
-            self.db.commit()
-            self.db.refresh(item)
-        
-        return item
+        # An empty item_id is set to the database ID for compatibility by the
+        # items_set_item_id trigger; create() refreshes the row, so it's already loaded
+        return self.create(**item_data)
     
     def update_from_sheets_format(self, item_id: int, sheets_data: Dict[str, Any]) -> Optional[Item]:
         """Update item using Google Sheets format data."""
@@ -725,6 +725,7 @@ def _get_autocreate_api_key():
 @app.route('/api/autocreate-chord-charts', methods=['POST'])
 def autocreate_chord_charts():
     """Autocreate chord charts from uploaded PDF/image files using Claude"""
+    usage_reserved = False
     try:
         app.logger.debug("Starting autocreate chord charts process")
         
@@ -860,16 +861,17 @@ def autocreate_chord_charts():
         # Get user_id for rate limiting and analytics
         user_id = current_user.id if current_user.is_authenticated else None
 
-        # Check rate limits (byoClaude users are exempt)
+        # Check rate limits and count this call up front (byoClaude users are exempt);
+        # the call is given back below if the analysis fails
         from app.utils.rate_limits import (
-            check_autocreate_rate_limit,
-            increment_autocreate_usage,
+            reserve_autocreate_call,
+            release_autocreate_call,
             get_autocreate_usage_info,
             AUTOCREATE_RATE_LIMITS
         )
 
-        allowed, reason, remaining_daily, remaining_hourly, daily_resets_at, hourly_resets_at = \
-            check_autocreate_rate_limit(user_id, tier, is_complimentary, is_using_own_key)
+        allowed, reason, remaining_daily, remaining_hourly, daily_resets_at, hourly_resets_at, usage_reserved = \
+            reserve_autocreate_call(user_id, tier, is_complimentary, is_using_own_key)
 
         if not allowed:
             app.logger.warning(f"[AUTOCREATE] Rate limit exceeded for user {user_id}: {reason}")
@@ -904,11 +906,6 @@ def autocreate_chord_charts():
         analysis_result = analyze_files_with_claude(client, uploaded_files, item_id, user_id)
         app.logger.info(f"[AUTOCREATE] Claude analysis completed, result type: {type(analysis_result)}")
 
-        # Increment usage counter after successful API call (only for non-byoClaude users)
-        if not is_using_own_key:
-            increment_autocreate_usage(user_id)
-            app.logger.info(f"[AUTOCREATE] Usage counter incremented for user {user_id}")
-
         app.logger.debug("Claude analysis complete, creating chord charts")
 
         return jsonify(analysis_result)
@@ -919,6 +916,10 @@ def autocreate_chord_charts():
         app.logger.error(f"Error in autocreate chord charts: {str(e)}")
         app.logger.error(f"Traceback: {traceback.format_exc()}")
 
+        # Only successful calls count toward the rate limit
+        if usage_reserved:
+            release_autocreate_call(user_id)
+
         # Return user-friendly error message (avoid exposing internals)
         error_msg = "Failed to process chord charts. Please check the logs for details."
 
@@ -1634,8 +1635,8 @@ def api_register():
     if appbuilder.sm.find_user(email=email):
         return jsonify({"error": "Email already registered"}), 409
 
-    # Get the Public role for new users
-    role = appbuilder.sm.find_role(appbuilder.sm.auth_user_registration_role)
+    # Get the Public role for new users (cached after the first registration)
+    role = appbuilder.sm.get_registration_role()
 
     if not role:
         app.logger.error("Public role not found - cannot register user")
@@ -1643,43 +1644,27 @@ def api_register():
 
     # Create user with Flask-AppBuilder
     try:
-        user = appbuilder.sm.add_user(
+        from werkzeug.security import generate_password_hash
+        user = appbuilder.sm.build_user(
             username=username,
             first_name=username,  # Use username as first name if not provided
             last_name='',
             email=email,
             role=role,
-            password=password  # Will be hashed by add_user()
+            hashed_password=generate_password_hash(password)
         )
+        # Flush only: the user, free subscription and demo data are committed together
+        # by create_demo_data_for_user(). The subscription row is inserted with the demo
+        # routine already active, and is still created on its own if demo data fails.
+        appbuilder.session.add(user)
+        appbuilder.session.flush()
 
-        if not user:
+        if not appbuilder.sm.create_demo_data_for_user(user, create_subscription=True):
             app.logger.error(f"Failed to create user: {username}")
             return jsonify({"error": "Registration failed"}), 500
 
         app.logger.info(f"User registered via API: {user.username} ({user.email}, id={user.id})")
 
-        # Create free subscription for new user
-        try:
-            from sqlalchemy import text
-            from app.database import SessionLocal
-
-            db = SessionLocal()
-            try:
-                db.execute(text("""
-                    INSERT INTO subscriptions (user_id, tier, status, mrr, created_at, updated_at)
-                    VALUES (:user_id, 'free', 'active', 0.00, NOW(), NOW())
-                """), {'user_id': user.id})
-                db.commit()
-                app.logger.info(f"Created free subscription for user {user.id}")
-            finally:
-                db.close()
-        except Exception as e:
-            app.logger.error(f"Failed to create subscription for user {user.id}: {e}")
-            # Don't fail registration if subscription creation fails
-
-        # Create demo data for first-run experience
-        appbuilder.sm.create_demo_data_for_user(user)
-
         # Automatically log the user in
         login_user(user)
         app.logger.info(f"User automatically logged in after registration: {user.username}")
@@ -1704,6 +1689,7 @@ def api_register():
 
     except Exception as e:
         app.logger.error(f"Error during registration: {e}")
+        appbuilder.session.rollback()
         import traceback
         app.logger.error(traceback.format_exc())
         return jsonify({"error": f"Registration failed: {str(e)}"}), 500
@@ -2897,6 +2883,10 @@ def update_email():
         appbuilder.session.commit()
         app.logger.info(f"Email changed from '{old_email}' to '{new_email}' for user id: {current_user.id}")
 
+        # PostHog distinct_id is the email; don't keep enriching events with the old one
+        from app.utils.posthog_client import forget_user
+        forget_user(current_user.id)
+
         # Update Stripe customer email if user has a subscription
         try:
             with DatabaseTransaction() as tx:
@@ -4,33 +4,285 @@ Custom Security Manager for Flask-AppBuilder with OAuth integration
 import logging
 from flask_appbuilder.security.sqla.manager import SecurityManager
 from flask_appbuilder.security.views import UserDBModelView, AuthDBView, AuthOAuthView
-from flask_appbuilder.security.forms import RegisterUserDBForm
+from flask_appbuilder.security.forms import RegisterUserDBForm, LoginForm_db
 from flask_appbuilder.security.registerviews import BaseRegisterUser
 from flask_appbuilder._compat import as_unicode
-from flask import flash, redirect
+from flask import flash, redirect, g, session, request, url_for, current_app, make_response
+from flask_login import login_user, logout_user, current_user
 from flask_babel import lazy_gettext
 from flask_appbuilder import expose
-from wtforms import StringField, PasswordField, HiddenField
+from wtforms import StringField, PasswordField
 from wtforms.validators import DataRequired, EqualTo, Email
 import os
+import base64
+import hashlib
+import hmac
+import json
+import secrets
+import traceback
+import msgspec
+import requests
+from requests.adapters import HTTPAdapter
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import text, func, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import make_transient_to_detached
+from werkzeug.security import generate_password_hash, check_password_hash
+from app.utils.posthog_client import track_event
 
 logger = logging.getLogger(__name__)
 
+# Password hashing (scrypt/pbkdf2) is CPU-heavy but releases the GIL, so registration
+# starts it here and overlaps it with the role lookup instead of blocking inside add_user()
+_password_hash_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='password-hash')
 
-class DummyRecaptchaField(HiddenField):
+
+class _OAuthKeepAliveAdapter(HTTPAdapter):
+    """HTTPAdapter shared by short-lived OAuth sessions; close() keeps the pool alive."""
+
+    def close(self):
+        pass
+
+
+# OAuth callbacks block the worker on provider HTTP calls (token exchange, userinfo).
+# authlib opens and closes a requests session per call, so every session mounts this
+# one adapter to keep provider connections warm instead of a new TLS handshake each time
+_oauth_http_adapter = _OAuthKeepAliveAdapter(pool_maxsize=20)
+_oauth_http = requests.Session()
+_oauth_http.mount('https://', _oauth_http_adapter)
+
+
+# Timing attack protection for logins that have no password to check (unknown users,
+# OAuth users): same PBKDF2 work as a pbkdf2:sha256:260000 hash, without reparsing one
+_FAKE_PASSWORD_SALT = b'fake'
+_FAKE_PASSWORD_ITERATIONS = 260000
+
+
+def _fake_password_check(password):
+    """Burn the same PBKDF2-SHA256 cost as a real password check; result is discarded."""
+    hashlib.pbkdf2_hmac('sha256', (password or '').encode('utf-8'), _FAKE_PASSWORD_SALT, _FAKE_PASSWORD_ITERATIONS)
+
+
+def _b64url(data):
+    """Unpadded base64url encoding, as used by JWT segments."""
+    return base64.urlsafe_b64encode(data).rstrip(b'=')
+
+
+# JOSE header for HS256 is constant, so encode it once (byte-identical to PyJWT's output)
+_JWT_HS256_HEADER = _b64url(b'{"alg":"HS256","typ":"JWT"}')
+
+# OAuth state payloads are tiny dicts; msgspec (already used for sessions) encodes compact JSON
+_oauth_state_encoder = msgspec.json.Encoder()
+_oauth_state_decoder = msgspec.json.Decoder()
+
+# Provider userinfo responses are decoded straight from the body bytes with msgspec
+_oauth_userinfo_decoder = msgspec.json.Decoder(dict)
+
+
+# Demo song chord charts (E, A, E, A) for new users; the JSON payloads never change,
+# so serialize them once at import instead of on every signup
+
+# E chord (appears twice: positions 0 and 2)
+_DEMO_E_CHORD = {
+    "fingers": [[2, 2, None], [3, 2, None], [4, 1, None]],
+    "barres": [],
+    "tuning": "EADGBE",
+    "capo": 0,
+    "startingFret": 1,
+    "numFrets": 4,
+    "numStrings": 6,
+    "openStrings": [1, 6],
+    "mutedStrings": [],
+    "sectionId": "section-intro",
+    "sectionLabel": "Intro",
+    "sectionRepeatCount": "",
+    "hasLineBreakAfter": False
+}
+
+# A chord (appears twice: positions 1 and 3)
+_DEMO_A_CHORD = {
+    "fingers": [[2, 2, None], [3, 2, None], [4, 2, None]],
+    "barres": [],
+    "tuning": "EADGBE",
+    "capo": 0,
+    "startingFret": 1,
+    "numFrets": 4,
+    "numStrings": 6,
+    "openStrings": [1, 5],
+    "mutedStrings": [6],
+    "sectionId": "section-intro",
+    "sectionLabel": "Intro",
+    "sectionRepeatCount": "",
+    "hasLineBreakAfter": False
+}
+
+_DEMO_E_CHORD_JSON = json.dumps(_DEMO_E_CHORD)
+_DEMO_A_CHORD_JSON = json.dumps(_DEMO_A_CHORD)
+
+
+# Free tier subscription row for a new user; built once at import like _DEMO_DATA_SQL
+_FREE_SUBSCRIPTION_INSERT = text("""
+    INSERT INTO subscriptions (user_id, tier, status, mrr, created_at, updated_at)
+    VALUES (:user_id, 'free', 'active', 0.00, NOW(), NOW())
+""")
+
+# Final CTE of the demo-data statement: either point the user's existing subscription
+# at the demo routine, or create the free subscription with it already set
+_DEMO_ACTIVE_ROUTINE_UPDATE_CTE = """
+    set_active_routine AS (
+        -- Set demo routine as active in subscriptions.last_active_routine_id (per-user)
+        UPDATE subscriptions
+        SET last_active_routine_id = (SELECT id FROM new_routine)
+        WHERE user_id = :user_id
+    )
+"""
+_DEMO_SUBSCRIPTION_INSERT_CTE = """
+    new_subscription AS (
+        INSERT INTO subscriptions (user_id, tier, status, mrr, last_active_routine_id, created_at, updated_at)
+        SELECT :user_id, 'free', 'active', 0.00, id, NOW(), NOW()
+        FROM new_routine
+    )
+"""
+
+# New-user demo data: item, routine, routine membership and chord charts in one
+# statement, ending in one of the CTEs above. Sibling CTEs can't see each other's
+# writes, so the item's id is drawn from its sequence up front and item_id (Google
+# Sheets compatibility pattern: item_id matches the database id) is written by the
+# INSERT itself. Both variants are built once as text() constructs at import, keyed
+# by create_subscription, so signups don't rebuild or re-scan the SQL for binds.
+_DEMO_DATA_CTES = """
+    WITH new_item_id AS (
+        SELECT nextval(pg_get_serial_sequence('items', 'id')) AS id
+    ),
+    new_item AS (
+        INSERT INTO items (id, item_id, title, notes, duration, description, "order", tuning, songbook, user_id, created_at, updated_at)
+        SELECT id, id::text, 'For What It''s Worth',
+            'There''s somethin'' happenin'' here...',
+            '5',
+            'Work on smooth transitions between E and A chords. Focus on strumming pattern and timing.',
+            0, 'EADGBE',
+            'C:\\Users\\Steven\\Documents\\Guitar\\Songbook\\ForWhatItsWorth',
+            :user_id, NOW(), NOW()
+        FROM new_item_id
+        RETURNING id
+    ),
+    new_routine AS (
+        INSERT INTO routines (name, "order", user_id, created_at)
+        VALUES ('Demo routine', 0, :user_id, NOW())
+        RETURNING id
+    ),
+    new_routine_item AS (
+        INSERT INTO routine_items (routine_id, item_id, "order", completed, created_at)
+        SELECT new_routine.id, new_item.id, 0, FALSE, NOW()
+        FROM new_routine, new_item
+    ),
+    new_chord_charts AS (
+        -- 4 chord charts (E, A, E, A) with Intro section
+        INSERT INTO chord_charts (item_id, title, chord_data, order_col, user_id, created_at)
+        SELECT new_item.id::text, chart.title, chart.chord_data, chart.order_col, :user_id, NOW()
+        FROM new_item, (VALUES
+            ('E', CAST(:e_chord_data AS json), 0),
+            ('A', CAST(:a_chord_data AS json), 1),
+            ('E', CAST(:e_chord_data AS json), 2),
+            ('A', CAST(:a_chord_data AS json), 3)
+        ) AS chart (title, chord_data, order_col)
+    ),
+"""
+_DEMO_DATA_SELECT = """
+    SELECT (SELECT id FROM new_item), (SELECT id FROM new_routine)
+"""
+_DEMO_DATA_SQL = {
+    True: text(_DEMO_DATA_CTES + _DEMO_SUBSCRIPTION_INSERT_CTE + _DEMO_DATA_SELECT),
+    False: text(_DEMO_DATA_CTES + _DEMO_ACTIVE_ROUTINE_UPDATE_CTE + _DEMO_DATA_SELECT),
+}
+
+
+@lru_cache(maxsize=32)
+def _oauth_redirect_uri(host_url, provider):
     """
-    Dummy recaptcha field that doesn't validate.
+    Build the OAuth callback URL for the incoming domain.
 
-    This replaces the real RecaptchaField to bypass Google reCAPTCHA validation
-    during development/testing.
+    The result only depends on the request's scheme/host (host_url) and the provider,
+    so it's cached on those instead of walking the URL map on every OAuth start.
+    Bounded, since the Host header is client-controlled. Must be called from a
+    CustomAuthOAuthView request, which the relative endpoint resolves against.
     """
-    def __init__(self, *args, **kwargs):
-        super(DummyRecaptchaField, self).__init__(*args, **kwargs)
-        self.data = ''  # Ensure data attribute exists
+    return url_for(".oauth_authorized", provider=provider, _external=True)
+
+
+def _remember_cookie_name():
+    """Name of Flask-Login's remember-me cookie (REMEMBER_COOKIE_NAME, as Flask-Login reads it)."""
+    return current_app.config.get('REMEMBER_COOKIE_NAME', 'remember_token')
+
+
+def _current_user_if_authenticated():
+    """
+    Return the logged-in user for this request, or None.
+
+    Flask-Login resolves g.user lazily (a SELECT on ab_user), so only touch it
+    when the session carries a user id or the request has a remember-me cookie
+    (which Flask-Login restores the login from). Anonymous visitors - the common
+    case on the login/signup pages - skip the lookup entirely.
+    """
+    if not session.get('_user_id') and _remember_cookie_name() not in request.cookies:
+        return None
+    user = g.user
+    if user is not None and user.is_authenticated:
+        return user
+    return None
 
-    def pre_validate(self, form):
-        """Override pre-validation to always pass."""
-        pass
+
+@lru_cache(maxsize=4)
+def _oauth_state_hmac(secret_key):
+    """Keyed HMAC-SHA256 template for OAuth state; callers copy() it instead of re-keying."""
+    return hmac.new(secret_key.encode(), digestmod=hashlib.sha256)
+
+
+def encode_oauth_state(state_data, secret_key):
+    """
+    Sign OAuth state data as an HS256 JWT without going through PyJWT.
+
+    The state only needs CSRF protection plus the login/signup intent, so we
+    skip PyJWT's key/algorithm resolution and sign with HMAC-SHA256 directly.
+    The token is a standard compact HS256 JWT, read back by decode_oauth_state().
+
+    Args:
+        state_data: JSON-serializable dict (request args + intent)
+        secret_key: App SECRET_KEY used as the HMAC key
+
+    Returns:
+        Token string suitable for the OAuth 'state' parameter
+    """
+    payload = _b64url(_oauth_state_encoder.encode(state_data))
+    signing_input = _JWT_HS256_HEADER + b'.' + payload
+    mac = _oauth_state_hmac(secret_key).copy()
+    mac.update(signing_input)
+    return (signing_input + b'.' + _b64url(mac.digest())).decode('ascii')
+
+
+def decode_oauth_state(token, secret_key):
+    """
+    Verify and decode an OAuth state token produced by encode_oauth_state().
+
+    Args:
+        token: State string returned by the provider on the callback
+        secret_key: App SECRET_KEY used as the HMAC key
+
+    Returns:
+        The state data dict
+
+    Raises:
+        ValueError: If the token is malformed or its signature doesn't match
+    """
+    header, payload, signature = token.encode('ascii').split(b'.')
+    if header != _JWT_HS256_HEADER:
+        raise ValueError("Unexpected OAuth state header")
+    mac = _oauth_state_hmac(secret_key).copy()
+    mac.update(header + b'.' + payload)
+    if not hmac.compare_digest(_b64url(mac.digest()), signature):
+        raise ValueError("Invalid OAuth state signature")
+    return _oauth_state_decoder.decode(base64.urlsafe_b64decode(payload + b'=' * (-len(payload) % 4)))
 
 
 class CustomRegisterUserDBForm(RegisterUserDBForm):
@@ -38,7 +290,7 @@ class CustomRegisterUserDBForm(RegisterUserDBForm):
     Custom registration form without reCAPTCHA.
 
     Flask-AppBuilder's default form includes reCAPTCHA which requires API keys.
-    This custom form replaces reCAPTCHA with a dummy field that doesn't validate.
+    This custom form drops the reCAPTCHA field entirely.
     """
     # Explicitly define all fields
     username = StringField('User Name', validators=[DataRequired()])
@@ -48,19 +300,10 @@ class CustomRegisterUserDBForm(RegisterUserDBForm):
     password = PasswordField('Password', validators=[DataRequired()])
     conf_password = PasswordField('Confirm Password', validators=[DataRequired(), EqualTo('password', message='Passwords must match')])
 
-    # Replace real RecaptchaField with dummy field that doesn't validate
-    recaptcha = DummyRecaptchaField()
-
-    def __init__(self, *args, **kwargs):
-        """Replace parent's recaptcha field with our dummy field."""
-        super(CustomRegisterUserDBForm, self).__init__(*args, **kwargs)
-        # Force replace the recaptcha field that was inherited from parent
-        # Create dummy field and bind it to this form properly
-        dummy = DummyRecaptchaField()
-        dummy = dummy.bind(self, 'recaptcha')
-        self._fields['recaptcha'] = dummy
-        # Also update the attribute
-        object.__setattr__(self, 'recaptcha', dummy)
+    # Remove the parent's RecaptchaField. WTForms' FormMeta only collects attributes
+    # that are unbound fields, so shadowing it with None leaves it out of the form:
+    # nothing to bind, validate or render per request.
+    recaptcha = None
 
 
 class ImmediateRegisterUserDBView(BaseRegisterUser):
@@ -75,46 +318,68 @@ class ImmediateRegisterUserDBView(BaseRegisterUser):
     message = lazy_gettext("User registered successfully. You can now login.")
     error_message = lazy_gettext("Registration failed. Please try again.")
 
+    # The Unique validators are appended to the form class's shared validator lists,
+    # so they only need attaching once per process
+    _unique_validations_added = False
+
+    def _ensure_unique_validations(self, form):
+        """Attach the username/email Unique validators if this process hasn't yet."""
+        if not type(self)._unique_validations_added:
+            self.add_form_unique_validations(form)
+            type(self)._unique_validations_added = True
+
     def form_get(self, form):
         """Add unique validations when form is displayed"""
-        self.add_form_unique_validations(form)
+        self._ensure_unique_validations(form)
 
     def form_post(self, form):
         """
         Process registration form and immediately create active user.
 
-        Bypasses the email activation flow by directly calling add_user().
+        Bypasses the email activation flow by creating the user directly.
+
+        A POST doesn't go through form_get first, so a worker that hasn't rendered the
+        form yet attaches the Unique validators here, for the POSTs that follow.
         """
-        self.add_form_unique_validations(form)
+        self._ensure_unique_validations(form)
 
-        # Get the Public role for new users
-        role = self.appbuilder.sm.find_role(
-            self.appbuilder.sm.auth_user_registration_role
-        )
+        # Hash the password in the background while we look up the role
+        password_hash = _password_hash_executor.submit(generate_password_hash, form.password.data)
+
+        # Get the Public role for new users (cached after the first registration)
+        role = self.appbuilder.sm.get_registration_role()
 
         if not role:
+            password_hash.cancel()
             flash(as_unicode("Public role not found. Cannot register user."), "danger")
             return
 
-        # Directly create active user (skip registration table + email)
-        user = self.appbuilder.sm.add_user(
+        # Directly create active user (skip registration table + email). The user is only
+        # flushed here; post_register() commits it with the subscription and demo data.
+        sm = self.appbuilder.sm
+        db = self.appbuilder.session
+        user = sm.build_user(
             username=form.username.data,
             first_name=form.first_name.data,
             last_name=form.last_name.data,
             email=form.email.data,
             role=role,
-            password=form.password.data  # Will be hashed by add_user()
+            hashed_password=password_hash.result()
         )
+        try:
+            db.add(user)
+            db.flush()
+        except Exception as e:
+            logger.error("Failed to add user %s: %s", form.username.data, e)
+            db.rollback()
+            user = None
 
-        if user:
+        if user and self.post_register(user):
             flash(as_unicode(self.message), "success")
-            logger.info(f"User registered successfully: {user.username} (id={user.id})")
-
-            # Call post_register hook to create free subscription
-            self.post_register(user)
+            logger.info("User registered successfully: %s (id=%s)", user.username, user.id)
         else:
             flash(as_unicode(self.error_message), "danger")
-            logger.error(f"Failed to register user: {form.username.data}")
+            logger.error("Failed to register user: %s", form.username.data)
 
     def post_register(self, user):
         """
@@ -123,30 +388,16 @@ class ImmediateRegisterUserDBView(BaseRegisterUser):
         Creates a free tier subscription and demo data for new users.
 
         Args:
-            user: Newly created User model instance
-        """
-        logger.info(f"Creating free subscription for user: {user.email} (id={user.id})")
-
-        try:
-            from sqlalchemy import text
-            # Get Flask-AppBuilder's session
-            db = self.appbuilder.session
+            user: Newly created (flushed, uncommitted) User model instance
 
-            # Insert subscription record using raw SQL
-            db.execute(text("""
-                INSERT INTO subscriptions (user_id, tier, status, mrr, created_at, updated_at)
-                VALUES (:user_id, 'free', 'active', 0.00, NOW(), NOW())
-            """), {'user_id': user.id})
-            db.commit()
-            logger.info(f"Created free subscription for user {user.id}")
-        except Exception as e:
-            logger.error(f"Failed to create subscription for user {user.id}: {e}")
-            import traceback
-            logger.error(traceback.format_exc())
-            db.rollback()
+        Returns:
+            True if the user, subscription and demo data were committed
+        """
+        logger.info("Creating free subscription for user: %s (id=%s)", user.email, user.id)
 
-        # Create demo data for first-run experience
-        self.appbuilder.sm.create_demo_data_for_user(user)
+        # User, subscription and demo data go in one commit; the subscription row is
+        # inserted with the demo routine already set as last_active_routine_id
+        return self.appbuilder.sm.create_demo_data_for_user(user, create_subscription=True)
 
 
 class CustomAuthOAuthView(AuthOAuthView):
@@ -167,13 +418,11 @@ class CustomAuthOAuthView(AuthOAuthView):
         number, resulting in http://localhost/oauth-authorized/google instead of
         http://localhost:5000/oauth-authorized/google.
         """
-        from flask import g, session, request, url_for
-        from flask_appbuilder.security.views import generate_random_string
-        import jwt
 
         # If already authenticated, redirect to main app
-        if g.user is not None and g.user.is_authenticated:
-            logger.debug(f"Already authenticated: {g.user}")
+        current = _current_user_if_authenticated()
+        if current is not None:
+            logger.debug("Already authenticated: %s", current)
             return redirect('/')
 
         if provider is None:
@@ -185,38 +434,8 @@ class CustomAuthOAuthView(AuthOAuthView):
                 appbuilder=self.appbuilder,
             )
 
-        logger.info(f"Initiating OAuth login with provider: {provider}")
-
-        # Generate state for CSRF protection - include intent=login
-        # Use app secret key for JWT (no need to store random secret in session)
-        # This prevents conflicts with authlib's internal state management
-        from flask import current_app
-        state_data = request.args.to_dict(flat=False)
-        state_data['intent'] = ['login']  # Mark this as login flow
-        state = jwt.encode(state_data, current_app.config['SECRET_KEY'], algorithm="HS256")
-
-        # DO NOT set session["oauth_state"] - let authlib handle its own state internally
-        # authlib uses _state_{provider}_{state_value} pattern which conflicts with our custom key
-
-        # Determine redirect_uri
-        # IMPORTANT: Always use url_for to match the incoming request domain
-        # This prevents session loss when user arrives via one domain but OAuth redirects to another
-        # (e.g., 127.0.0.1 → localhost, or guitarpracticeroutine.net → guitarpracticeroutine.com)
-        redirect_uri = url_for(".oauth_authorized", provider=provider, _external=True)
-        logger.info(f"OAuth redirect_uri (matches incoming domain): {redirect_uri}")
-
-        try:
-            # Call authorize_redirect with our explicit redirect_uri
-            # prompt='select_account' is configured in client_kwargs (app/__init__.py)
-            # authorize_redirect handles state saving automatically via save_authorize_data()
-            return self.appbuilder.sm.oauth_remotes[provider].authorize_redirect(
-                redirect_uri=redirect_uri,
-                state=state.decode("ascii") if isinstance(state, bytes) else state
-            )
-        except Exception as e:
-            logger.error(f"Error on OAuth authorize: {e}")
-            flash(as_unicode(self.invalid_login_message), "warning")
-            return redirect('/')
+        logger.info("Initiating OAuth login with provider: %s", provider)
+        return self._oauth_start(provider, 'login', self.invalid_login_message, '/')
 
     @expose('/oauth-signup/<provider>')
     def signup(self, provider=None):
@@ -226,28 +445,36 @@ class CustomAuthOAuthView(AuthOAuthView):
         This is separate from /login/<provider> to distinguish signup vs login intent.
         If user already exists, logs them in and shows tour anyway.
         """
-        from flask import g, session, request, url_for
-        from flask_appbuilder.security.views import generate_random_string
-        import jwt
 
         # If already authenticated, redirect to main app
-        if g.user is not None and g.user.is_authenticated:
-            logger.debug(f"Already authenticated: {g.user}")
+        current = _current_user_if_authenticated()
+        if current is not None:
+            logger.debug("Already authenticated: %s", current)
             return redirect('/')
 
         if provider is None:
             # Redirect to register page if no provider specified
             return redirect('/signup')
 
-        logger.info(f"Initiating OAuth signup with provider: {provider}")
+        logger.info("Initiating OAuth signup with provider: %s", provider)
+        return self._oauth_start(provider, 'signup', "OAuth signup failed. Please try again.", '/signup')
 
-        # Generate state for CSRF protection - include intent=signup
+    def _oauth_start(self, provider, intent, error_message, error_redirect):
+        """
+        Redirect to the provider's authorize URL, carrying the login/signup intent in state.
+
+        Args:
+            provider: OAuth provider name
+            intent: 'login' or 'signup' - read back in oauth_authorized()
+            error_message: Flash message if the redirect can't be built
+            error_redirect: Where to send the user on error
+        """
+        # Generate state for CSRF protection - include intent
         # Use app secret key for JWT (no need to store random secret in session)
         # This prevents conflicts with authlib's internal state management
-        from flask import current_app
         state_data = request.args.to_dict(flat=False)
-        state_data['intent'] = ['signup']  # Mark this as signup flow
-        state = jwt.encode(state_data, current_app.config['SECRET_KEY'], algorithm="HS256")
+        state_data['intent'] = [intent]
+        state = encode_oauth_state(state_data, current_app.config['SECRET_KEY'])
 
         # DO NOT set session["oauth_state"] - let authlib handle its own state internally
         # authlib uses _state_{provider}_{state_value} pattern which conflicts with our custom key
@@ -256,8 +483,8 @@ class CustomAuthOAuthView(AuthOAuthView):
         # IMPORTANT: Always use url_for to match the incoming request domain
         # This prevents session loss when user arrives via one domain but OAuth redirects to another
         # (e.g., 127.0.0.1 → localhost, or guitarpracticeroutine.net → guitarpracticeroutine.com)
-        redirect_uri = url_for(".oauth_authorized", provider=provider, _external=True)
-        logger.info(f"OAuth redirect_uri (matches incoming domain): {redirect_uri}")
+        redirect_uri = _oauth_redirect_uri(request.host_url, provider)
+        logger.info("OAuth redirect_uri (matches incoming domain): %s", redirect_uri)
 
         try:
             # Call authorize_redirect with our explicit redirect_uri
@@ -265,12 +492,12 @@ class CustomAuthOAuthView(AuthOAuthView):
             # authorize_redirect handles state saving automatically via save_authorize_data()
             return self.appbuilder.sm.oauth_remotes[provider].authorize_redirect(
                 redirect_uri=redirect_uri,
-                state=state.decode("ascii") if isinstance(state, bytes) else state
+                state=state
             )
         except Exception as e:
-            logger.error(f"Error on OAuth authorize: {e}")
-            flash(as_unicode("OAuth signup failed. Please try again."), "warning")
-            return redirect('/signup')
+            logger.error("Error on OAuth authorize: %s", e)
+            flash(as_unicode(error_message), "warning")
+            return redirect(error_redirect)
 
     @expose('/oauth-authorized/<provider>')
     def oauth_authorized(self, provider):
@@ -280,20 +507,14 @@ class CustomAuthOAuthView(AuthOAuthView):
         Checks the 'intent' in the JWT state to determine if this was initiated
         from /login/<provider> (login-only) or /oauth-signup/<provider> (signup).
         """
-        from flask import g, request, session
-        from flask_login import login_user
-        import jwt
-
-        logger.info(f"OAuth callback from provider: {provider}")
 
-        # Track OAuth flow started (intent determined later)
-        from app.utils.posthog_client import track_event
+        logger.info("OAuth callback from provider: %s", provider)
 
         # Get OAuth token from provider
         try:
             resp = self.appbuilder.sm.oauth_remotes[provider].authorize_access_token()
         except Exception as e:
-            logger.error(f"OAuth token error: {e}")
+            logger.error("OAuth token error: %s", e)
             # Track OAuth failure
             track_event(None, 'oauth_flow_failed', {
                 'oauth_provider': provider,
@@ -307,22 +528,21 @@ class CustomAuthOAuthView(AuthOAuthView):
             flash(as_unicode("Access denied"), "warning")
             return redirect('/login')
 
-        logger.info(f"OAuth token received from {provider}")
+        logger.info("OAuth token received from %s", provider)
 
         # Decode state to check intent (login vs signup)
         # State JWT is signed with app SECRET_KEY (not stored in session)
         intent = 'login'  # Default to login
         try:
             if request.args.get('state'):
-                from flask import current_app
                 state_jwt = request.args.get('state')
                 # Decode using static SECRET_KEY (same as in login/signup methods)
-                decoded_state = jwt.decode(state_jwt, current_app.config['SECRET_KEY'], algorithms=["HS256"])
+                decoded_state = decode_oauth_state(state_jwt, current_app.config['SECRET_KEY'])
                 intent_list = decoded_state.get('intent', ['login'])
                 intent = intent_list[0] if isinstance(intent_list, list) else intent_list
-                logger.info(f"OAuth intent: {intent}")
+                logger.info("OAuth intent: %s", intent)
         except Exception as e:
-            logger.warning(f"Could not decode OAuth state, defaulting to login: {e}")
+            logger.warning("Could not decode OAuth state, defaulting to login: %s", e)
 
         # Extract user info
         userinfo = self.appbuilder.sm.oauth_user_info(provider, resp)
@@ -332,7 +552,7 @@ class CustomAuthOAuthView(AuthOAuthView):
             redirect_url = '/signup' if intent == 'signup' else '/login'
             return redirect(redirect_url)
 
-        logger.info(f"OAuth user info: {userinfo.get('email')}")
+        logger.info("OAuth user info: %s", userinfo.get('email'))
 
         # Check if user already exists
         # For Tidal users, ALWAYS look up by username first (not email)
@@ -342,7 +562,7 @@ class CustomAuthOAuthView(AuthOAuthView):
             # Tidal user - look up by stable username, NOT by email
             existing_user = self.appbuilder.sm.find_user(username=username)
             if existing_user:
-                logger.info(f"Found Tidal user by username: {username}")
+                logger.info("Found Tidal user by username: %s", username)
         else:
             # Non-Tidal user - look up by email as usual
             existing_user = self.appbuilder.sm.find_user(email=userinfo.get('email'))
@@ -350,7 +570,7 @@ class CustomAuthOAuthView(AuthOAuthView):
         if intent == 'login':
             # LOGIN FLOW: Only authenticate existing users
             if not existing_user:
-                logger.info(f"OAuth login failed - no account found for: {userinfo.get('email')}")
+                logger.info("OAuth login failed - no account found for: %s", userinfo.get('email'))
                 # Track OAuth flow completion (failed - no account)
                 track_event(None, 'oauth_flow_completed', {
                     'oauth_provider': provider,
@@ -366,11 +586,10 @@ class CustomAuthOAuthView(AuthOAuthView):
             user = existing_user
 
             # Mark session as permanent to persist across browser restarts
-            from flask import session
             session.permanent = True
 
             login_user(user, remember=True)
-            logger.info(f"User logged in via OAuth: {user.username}")
+            logger.info("User logged in via OAuth: %s", user.username)
 
             # Track successful OAuth login
             track_event(user.id, 'user_logged_in', {
@@ -389,15 +608,14 @@ class CustomAuthOAuthView(AuthOAuthView):
             # SIGNUP FLOW: Create new user OR login existing (both get tour)
             if existing_user:
                 # User already exists - log them in AND show tour
-                logger.info(f"OAuth signup - user already exists: {userinfo.get('email')}")
+                logger.info("OAuth signup - user already exists: %s", userinfo.get('email'))
                 user = existing_user
 
                 # Mark session as permanent to persist across browser restarts
-                from flask import session
                 session.permanent = True
 
                 login_user(user, remember=True)
-                logger.info(f"Existing user logged in via OAuth signup: {user.username}")
+                logger.info("Existing user logged in via OAuth signup: %s", user.username)
 
                 # Track OAuth signup (existing user)
                 track_event(user.id, 'user_logged_in', {
@@ -413,8 +631,9 @@ class CustomAuthOAuthView(AuthOAuthView):
                 # Redirect with show_tour flag
                 return redirect('/?show_tour=true')
             else:
-                # Create new user
-                user = self.appbuilder.sm.auth_user_oauth(userinfo)
+                # Create new user - the lookup above already found no account, so skip
+                # auth_user_oauth's find-or-create and its repeat ab_user queries
+                user = self.appbuilder.sm.create_oauth_user(userinfo)
 
                 if user is None:
                     # Track OAuth signup failure
@@ -426,12 +645,11 @@ class CustomAuthOAuthView(AuthOAuthView):
                     return redirect('/signup')
 
                 # Mark session as permanent to persist across browser restarts
-                from flask import session
                 session.permanent = True
 
                 # Login user (remember=True keeps session persistent across browser restarts)
                 login_user(user, remember=True)
-                logger.info(f"New user created and logged in via OAuth: {user.username}")
+                logger.info("New user created and logged in via OAuth: %s", user.username)
 
                 # Track new user registration via OAuth
                 track_event(user.id, 'user_registered', {
@@ -464,22 +682,20 @@ class CustomAuthDBView(AuthDBView):
 
         Simplified version that doesn't rely on internal Flask-AppBuilder APIs.
         """
-        from flask import g, request
-        from flask_appbuilder.security.forms import LoginForm_db
-        from flask_login import login_user
 
-        logger.debug(f"Login method called - Request method: {request.method}")
+        logger.debug("Login method called - Request method: %s", request.method)
 
         # If already authenticated, redirect to main app
-        if g.user is not None and g.user.is_authenticated:
-            logger.debug(f"Already authenticated: {g.user.username}")
+        current = _current_user_if_authenticated()
+        if current is not None:
+            logger.debug("Already authenticated: %s", current.username)
             return redirect('/')
 
         form = LoginForm_db()
-        logger.debug(f"Form created - Is POST: {request.method == 'POST'}")
+        logger.debug("Form created - Is POST: %s", request.method == 'POST')
 
         if form.validate_on_submit():
-            logger.info(f"Form validated successfully - Username: {form.username.data}")
+            logger.info("Form validated successfully - Username: %s", form.username.data)
 
             # Authenticate user
             user = self.appbuilder.sm.auth_user_db(
@@ -487,7 +703,7 @@ class CustomAuthDBView(AuthDBView):
             )
 
             if not user:
-                logger.warning(f"Authentication failed for username: {form.username.data}")
+                logger.warning("Authentication failed for username: %s", form.username.data)
                 flash(as_unicode(self.invalid_login_message), "warning")
                 # Redirect back to login page
                 next_url = request.args.get("next", "")
@@ -496,10 +712,9 @@ class CustomAuthDBView(AuthDBView):
                 return redirect('/login/')
 
             # Login successful (remember=True keeps session persistent across browser restarts)
-            logger.info(f"Login successful for user: {user.username}")
+            logger.info("Login successful for user: %s", user.username)
 
             # Mark session as permanent to persist across browser restarts
-            from flask import session
             session.permanent = True
 
             login_user(user, remember=True)
@@ -512,7 +727,7 @@ class CustomAuthDBView(AuthDBView):
             return redirect(next_url)
         else:
             if request.method == 'POST':
-                logger.error(f"Form validation failed - Errors: {form.errors}")
+                logger.error("Form validation failed - Errors: %s", form.errors)
 
         # Show login form
         return self.render_template(
@@ -528,28 +743,30 @@ class CustomAuthDBView(AuthDBView):
         Override logout to redirect to /login instead of /admin/.
         Clears Flask session, remember-me cookie, and logs out user.
         """
-        from flask_login import logout_user, current_user
-        from flask import session, current_app, make_response
 
-        # Track logout event before clearing session
-        if current_user.is_authenticated:
-            from app.utils.posthog_client import track_event
-            track_event(current_user.id, 'user_logged_out', {})
+        # Track logout event before clearing session (also for remember-cookie-only logins,
+        # which _current_user_if_authenticated() restores)
+        current = _current_user_if_authenticated()
+        if current is not None:
+            track_event(current.id, 'user_logged_out', {})
+
+        # Anonymous visitors with an empty session have nothing to clear in Redis
+        had_session = bool(session)
 
         # Log out the user (clears Flask-Login session)
         logout_user()
 
-        # Clear the entire Flask session to remove any OAuth state
-        session.clear()
-
-        # Create response and force session save
         response = make_response(redirect('/login'))
-        current_app.session_interface.save_session(current_app, session, response)
+
+        if had_session:
+            # Clear the entire Flask session to remove any OAuth state, and force the save
+            session.clear()
+            current_app.session_interface.save_session(current_app, session, response)
 
         # Explicitly delete the remember-me cookie (Flask-Login sets this with remember=True)
         # This prevents automatic re-login on next request
-        response.set_cookie('remember_token', '', expires=0, max_age=0)
-        response.set_cookie('session', '', expires=0, max_age=0)
+        response.delete_cookie(_remember_cookie_name())
+        response.delete_cookie('session')
 
         flash(as_unicode('You have been logged out.'), 'info')
         return response
@@ -579,20 +796,15 @@ class CustomRegisterUserDBView_OLD(AuthDBView):
         # Create free tier subscription for new user using raw SQL
         # (Our Subscription model uses a different SQLAlchemy Base than Flask-AppBuilder)
         try:
-            from sqlalchemy import text
             # Use Flask-AppBuilder's session which has access to ab_user table
             db = self.get_session()
 
             # Insert subscription record using raw SQL
-            db.execute(text("""
-                INSERT INTO subscriptions (user_id, tier, status, mrr, created_at, updated_at)
-                VALUES (:user_id, 'free', 'active', 0.00, NOW(), NOW())
-            """), {'user_id': user.id})
+            db.execute(_FREE_SUBSCRIPTION_INSERT, {'user_id': user.id})
             db.commit()
             logger.info(f"Created free subscription for user {user.id}")
         except Exception as e:
             logger.error(f"Failed to create subscription for user {user.id}: {e}")
-            import traceback
             logger.error(traceback.format_exc())
             db.rollback()
 
@@ -617,6 +829,12 @@ if not isinstance(getattr(_FABUser, 'impersonate', None), property):
     _FABUser.impersonate = _impersonate_prop
 
 
+# Admin delete-guard messages. Plain str constants (not lazy_gettext) so they serialize
+# cleanly into Redis sessions without a per-flash str() conversion.
+_CANNOT_DELETE_SELF_MESSAGE = "You cannot delete your own account. Please have another admin delete it."
+_CANNOT_DELETE_LAST_ADMIN_MESSAGE = "Cannot delete the last admin user. Create another admin first."
+
+
 class CustomUserDBModelView(UserDBModelView):
     """
     Custom User Model View with delete protection and admin impersonation.
@@ -642,27 +860,32 @@ class CustomUserDBModelView(UserDBModelView):
         Raises:
             Exception: If deletion is not allowed
         """
-        from flask_login import current_user
 
         # Prevent users from deleting themselves
         if current_user.id == item.id:
-            # Convert to str() to avoid LazyString serialization issues with Redis sessions
-            flash(str("You cannot delete your own account. Please have another admin delete it."), "danger")
+            flash(_CANNOT_DELETE_SELF_MESSAGE, "danger")
             raise Exception("Cannot delete current user")
 
         # Check if this is the last admin user
-        admin_role = self.appbuilder.sm.find_role('Admin')
-        if admin_role and admin_role in item.roles:
-            # Count how many admin users exist
-            admin_count = self.appbuilder.session.query(self.datamodel.obj).join(
-                self.datamodel.obj.roles
-            ).filter(
-                self.datamodel.obj.roles.contains(admin_role)
-            ).count()
-
-            if admin_count <= 1:
-                # Convert to str() to avoid LazyString serialization issues with Redis sessions
-                flash(str("Cannot delete the last admin user. Create another admin first."), "danger")
+        admin_role = self.appbuilder.sm.get_cached_role('Admin')
+        if admin_role:
+            # One round-trip with two EXISTS probes instead of loading item.roles and
+            # COUNTing every admin: is this user an admin, and does any other admin exist?
+            user_model = self.datamodel.obj
+            db = self.appbuilder.session
+            is_admin, other_admin_exists = db.query(
+                db.query(user_model).filter(
+                    user_model.id == item.id,
+                    user_model.roles.any(id=admin_role.id)
+                ).exists(),
+                db.query(user_model).filter(
+                    user_model.id != item.id,
+                    user_model.roles.any(id=admin_role.id)
+                ).exists()
+            ).one()
+
+            if is_admin and not other_admin_exists:
+                flash(_CANNOT_DELETE_LAST_ADMIN_MESSAGE, "danger")
                 raise Exception("Cannot delete last admin user")
 
         logger.info(f"User deletion validated: {item.username} (id={item.id})")
@@ -716,10 +939,15 @@ class CustomSecurityManager(SecurityManager):
 
         # Manually initialize OAuth support (FAB only does this when AUTH_TYPE == AUTH_OAUTH)
         # We need it for AUTH_DB + OAuth hybrid authentication
-        from flask import current_app
         if self.oauth_providers:
             logger.info("Initializing OAuth providers for hybrid auth (DB + OAuth)")
             from authlib.integrations.flask_client import OAuth
+            from authlib.integrations.requests_client import OAuth2Session
+
+            class PooledOAuth2Session(OAuth2Session):
+                def __init__(self, *args, **kwargs):
+                    super().__init__(*args, **kwargs)
+                    self.mount('https://', _oauth_http_adapter)
 
             self.oauth = OAuth(current_app)
             self.oauth_remotes = {}
@@ -730,6 +958,8 @@ class CustomSecurityManager(SecurityManager):
                     provider_name, **_provider["remote_app"]
                 )
                 obj_provider._tokengetter = self.oauth_tokengetter
+                # Token exchange and API calls reuse the shared keep-alive connection pool
+                obj_provider.client_cls = PooledOAuth2Session
                 if not self.oauth_user_info:
                     self.oauth_user_info = self.get_oauth_user_info
                 # Whitelist only users with matching emails
@@ -740,6 +970,43 @@ class CustomSecurityManager(SecurityManager):
         else:
             logger.warning("No OAuth providers configured")
 
+    def get_registration_role(self):
+        """
+        Return the role assigned to newly registered users (DB and OAuth signups).
+
+        Returns:
+            Role instance bound to the current session, or None if the role is missing
+        """
+        return self.get_cached_role(self.auth_user_registration_role)
+
+    def get_cached_role(self, name):
+        """
+        Return a role by name, hitting ab_role only on the first lookup per process.
+
+        The role's id/name are cached; later calls attach a copy to the current session
+        with merge(load=False), which skips the SELECT. A cached ORM instance can't be
+        shared directly since each request gets its own session. Roles are created at
+        startup, so restarting the app refreshes this.
+
+        Args:
+            name: Role name (e.g. 'Public', 'Admin')
+
+        Returns:
+            Role instance bound to the current session, or None if the role is missing
+        """
+        role_keys = self.__dict__.setdefault('_role_keys', {})
+        cached = role_keys.get(name)
+        if cached is None:
+            role = self.find_role(name)
+            if role:
+                role_keys[name] = (role.id, role.name)
+            return role
+
+        role_id, role_name = cached
+        role = self.role_model(id=role_id, name=role_name)
+        make_transient_to_detached(role)
+        return self.appbuilder.session.merge(role, load=False)
+
     def register_views(self):
         """
         Override register_views to support hybrid authentication (DB + OAuth).
@@ -764,14 +1031,13 @@ class CustomSecurityManager(SecurityManager):
         # Rename 'Security' menu to 'Info & Perms'
         # Flask-AppBuilder stores menu items in appbuilder.menu
         # We need to update both the category name and label
-        for item in self.appbuilder.menu.menu:
-            if item.name == 'Security':
-                logger.info("Renaming 'Security' menu to 'Info & Perms'")
-                item.name = 'Info & Perms'
-                # Also update the label for display
-                if hasattr(item, 'label'):
-                    item.label = 'Info & Perms'
-                break
+        item = self.appbuilder.menu.find('Security')
+        if item:
+            logger.info("Renaming 'Security' menu to 'Info & Perms'")
+            item.name = 'Info & Perms'
+            # Also update the label for display
+            if hasattr(item, 'label'):
+                item.label = 'Info & Perms'
 
     def auth_user_db(self, username, password):
         """
@@ -788,12 +1054,12 @@ class CustomSecurityManager(SecurityManager):
         Returns:
             User object if authentication succeeds, None if fails
         """
-        from werkzeug.security import check_password_hash
 
-        # Find user by username or email
-        user = self.find_user(username=username)
-        if not user:
-            user = self.find_user(email=username)
+        if not username:
+            return None
+
+        # Find user by username or email in one query (username match wins, as before)
+        user = self.find_user_by_login(username)
 
         # Check if this is an OAuth user (password=NULL) or user doesn't exist
         if not user or user.password is None:
@@ -801,18 +1067,50 @@ class CustomSecurityManager(SecurityManager):
             # to match the timing of real password validation (~100-300ms)
             # This prevents attackers from enumerating valid usernames by
             # measuring response time differences
-            fake_hash = 'pbkdf2:sha256:260000$fake$5F9a3b8c2d1e0f4a5b6c7d8e9f0a1b2c3d4e5f6a7b8c9d0e1f2a3b4c5d6e7f8'
-            check_password_hash(fake_hash, password or '')
+            _fake_password_check(password)
 
             if not user:
-                logger.debug(f"User not found: {username}")
+                logger.debug("User not found: %s", username)
             else:
-                logger.info(f"Login attempt blocked for OAuth user: {username}")
+                logger.info("Login attempt blocked for OAuth user: %s", username)
 
             return None
 
-        # Normal password check for non-OAuth users
-        return super(CustomSecurityManager, self).auth_user_db(username, password)
+        if not user.is_active:
+            _fake_password_check(password)
+            logger.info("Login attempt blocked for inactive user: %s", username)
+            return None
+
+        # Normal password check for non-OAuth users. Done here rather than via
+        # super().auth_user_db(), which would repeat both find_user lookups.
+        if check_password_hash(user.password, password):
+            self.update_user_auth_stat(user, True)
+            return user
+        self.update_user_auth_stat(user, False)
+        return None
+
+    def find_user_by_login(self, login):
+        """
+        Find a user by username or email with a single SELECT.
+
+        Matches FAB's find_user() semantics (case-insensitive username when
+        AUTH_USERNAME_CI is set, exact email) and prefers a username match
+        over an email match, like looking up username first then email.
+
+        Args:
+            login: Username or email entered on the login form
+
+        Returns:
+            User object or None
+        """
+        user_model = self.user_model
+        if self.auth_username_ci:
+            username_match = func.lower(user_model.username) == func.lower(login)
+        else:
+            username_match = user_model.username == login
+        return self.appbuilder.session.query(user_model).filter(
+            or_(username_match, user_model.email == login)
+        ).order_by(username_match.desc()).first()
 
     def generate_unique_username(self, base_username):
         """
@@ -824,25 +1122,40 @@ class CustomSecurityManager(SecurityManager):
         Returns:
             Unique username that doesn't exist in ab_user table
         """
-        from flask_appbuilder.security.sqla.models import User
+
+        # Fetch every taken candidate (base_username, base_username1, base_username2, ...)
+        # in one query instead of probing find_user() once per counter value.
+        # Compared lowercased, matching find_user()'s case-insensitive usernames.
+        like_prefix = base_username.lower().replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        taken = {
+            row[0] for row in self.appbuilder.session.execute(text("""
+                SELECT lower(username) FROM ab_user
+                WHERE lower(username) = :base
+                   OR (lower(username) LIKE :prefix
+                       AND substring(lower(username) FROM :suffix_start) ~ '^[0-9]+$')
+            """), {
+                'base': base_username.lower(),
+                'prefix': like_prefix + '%',
+                'suffix_start': len(base_username) + 1
+            })
+        }
 
         # Try base username first
         username = base_username
         counter = 1
 
         # Keep trying with incremented counter until we find an available username
-        while self.find_user(username=username):
+        while username.lower() in taken:
             username = f"{base_username}{counter}"
             counter += 1
 
             # Safety limit to prevent infinite loops
             if counter > 1000:
                 # Fallback to email prefix + random string
-                import secrets
                 username = f"{base_username}_{secrets.token_hex(4)}"
                 break
 
-        logger.info(f"Generated unique username: {username} (base: {base_username})")
+        logger.info("Generated unique username: %s (base: %s)", username, base_username)
         return username
 
     def auth_user_oauth(self, userinfo):
@@ -865,7 +1178,7 @@ class CustomSecurityManager(SecurityManager):
             logger.error("OAuth login failed: no email in userinfo")
             return None
 
-        logger.info(f"Authenticating OAuth user: {email}")
+        logger.info("Authenticating OAuth user: %s", email)
 
         # Try to find existing user by email
         user = self.find_user(email=email)
@@ -874,79 +1187,109 @@ class CustomSecurityManager(SecurityManager):
         # This handles the case where email format changed (e.g., @gpra.local -> @no_email_provided_by_tidal.com)
         # Tidal users have predictable usernames: tidal_{user_id}
         if not user and username and username.startswith('tidal_'):
-            logger.info(f"Trying fallback lookup by username for Tidal user: {username}")
+            logger.info("Trying fallback lookup by username for Tidal user: %s", username)
             user = self.find_user(username=username)
             if user:
-                logger.info(f"Found Tidal user by username: {user.username} (email was: {user.email})")
+                logger.info("Found Tidal user by username: %s (email was: %s)", user.username, user.email)
                 # Update email to current format
                 if user.email != email:
-                    logger.info(f"Updating Tidal user email from {user.email} to {email}")
+                    logger.info("Updating Tidal user email from %s to %s", user.email, email)
                     user.email = email
                     self.appbuilder.session.commit()
 
         if user:
-            logger.info(f"Found existing OAuth user: {user.username}")
-            # Update last login time
-            user.last_login = self.appbuilder.session.query(self.user_model).filter_by(id=user.id).first().last_login
-            self.appbuilder.session.commit()
+            logger.info("Found existing OAuth user: %s", user.username)
+            # Update last login time (and login count) without re-selecting the row
+            self.update_user_auth_stat(user, True)
             return user
 
+        return self.create_oauth_user(userinfo)
+
+    def build_user(self, username, first_name, last_name, email, role, hashed_password=None):
+        """
+        Build an active, unsaved user with a single role.
+
+        Unlike add_user(), nothing is flushed or committed: callers add the user to the
+        session and commit it together with its subscription and demo data.
+
+        Args:
+            hashed_password: Pre-hashed password, or None for OAuth users
+        """
+        user = self.user_model()
+        user.first_name = first_name
+        user.last_name = last_name
+        user.username = username
+        user.email = email
+        user.active = True
+        user.roles = [role]
+        user.password = hashed_password
+        return user
+
+    def create_oauth_user(self, userinfo):
+        """
+        Create a new OAuth user with Public role, free subscription and demo data.
+
+        Callers that have already established no account exists (the OAuth signup
+        callback) call this directly to skip auth_user_oauth's repeat ab_user lookups.
+
+        Args:
+            userinfo: Dictionary with user info (email, username, first_name, last_name)
+
+        Returns:
+            User object if successful, None if failed
+        """
+        email = userinfo.get('email')
+        username = userinfo.get('username')
+
         # Create new user
-        logger.info(f"Creating new OAuth user: {email}")
+        logger.info("Creating new OAuth user: %s", email)
 
-        # Get Public role for new users
-        role = self.find_role(self.auth_user_registration_role)
+        # Get Public role for new users (cached after the first registration)
+        role = self.get_registration_role()
         if not role:
             logger.error("Public role not found - cannot create OAuth user")
             return None
 
-        # Create user (without password - OAuth users don't have passwords)
-        user = self.add_user(
-            username=username,
+        # Create user with password=NULL to mark as OAuth user (can't login with password).
+        # Built directly rather than via add_user(), which would hash an empty password
+        # and need a second UPDATE + commit to NULL it again.
+        # ab_user's unique constraint is case-sensitive but logins aren't (AUTH_USERNAME_CI),
+        # so pick a name that's free case-insensitively before inserting
+        user = self.build_user(
+            username=self.generate_unique_username(username),
             first_name=userinfo.get('first_name', ''),
             last_name=userinfo.get('last_name', ''),
             email=email,
-            role=role
+            role=role,
         )
-
-        if not user:
-            logger.error(f"Failed to create OAuth user: {email}")
-            return None
-
-        logger.info(f"Created OAuth user: {user.username} (id={user.id})")
-
-        # Set password to NULL to mark as OAuth user (can't login with password)
+        db = self.appbuilder.session
         try:
-            user.password = None
-            self.appbuilder.session.commit()
-            logger.info(f"Set password=NULL for OAuth user {user.username}")
+            # Flush only: the user is committed together with its subscription and demo data.
+            # ab_user's unique constraint still settles a race with a concurrent signup that
+            # took the same name: roll back to the savepoint and retry once with a new name.
+            try:
+                with db.begin_nested():
+                    db.add(user)
+            except IntegrityError:
+                user.username = self.generate_unique_username(username)
+                db.add(user)
+                db.flush()
         except Exception as e:
-            logger.error(f"Failed to set NULL password for OAuth user: {e}")
-            # Continue anyway - not critical
-
-        # Create free subscription for new OAuth user
-        try:
-            from sqlalchemy import text
-            db = self.appbuilder.session
-
-            db.execute(text("""
-                INSERT INTO subscriptions (user_id, tier, status, mrr, created_at, updated_at)
-                VALUES (:user_id, 'free', 'active', 0.00, NOW(), NOW())
-            """), {'user_id': user.id})
-            db.commit()
-            logger.info(f"Created free subscription for OAuth user {user.id}")
-        except Exception as e:
-            logger.error(f"Failed to create subscription for OAuth user {user.id}: {e}")
-            import traceback
-            logger.error(traceback.format_exc())
+            logger.error("Failed to create OAuth user: %s: %s", email, e)
             db.rollback()
+            return None
+
+        logger.info("Created OAuth user: %s (id=%s)", user.username, user.id)
 
-        # Create demo data for first-run experience
-        self.create_demo_data_for_user(user)
+        # Create free subscription and demo data for first-run experience; this commits
+        # the user, subscription and demo rows in one transaction
+        if not self.create_demo_data_for_user(user, create_subscription=True):
+            logger.error("Failed to create OAuth user: %s", email)
+            return None
 
         return user
 
-    def create_demo_data_for_user(self, user):
+    def create_demo_data_for_user(self, user, create_subscription=False):
         """
         Create demo routine and item for new user's first-run experience.
 
@@ -956,136 +1299,70 @@ class CustomSecurityManager(SecurityManager):
         - 4 chord charts: E, A, E, A (Intro section)
         - Sets routine as active
 
+        Demo writes run in a SAVEPOINT and everything is committed once at the end, so
+        any pending writes from the caller (e.g. a just-flushed OAuth user) share the
+        same transaction.
+
         Args:
             user: Newly created User model instance
+            create_subscription: Also insert the user's free subscription in the same
+                statement and commit, instead of updating an existing row
+
+        Returns:
+            True if the transaction committed, False if it had to be rolled back
 
         Note:
             Fails silently to avoid blocking user registration if demo data creation fails.
+            When create_subscription is set, the free subscription is still created on its own.
         """
-        logger.info(f"Creating demo data for user: {user.email} (id={user.id})")
+        logger.info("Creating demo data for user: %s (id=%s)", user.email, user.id)
+        db = self.appbuilder.session
+        savepoint = None
 
         try:
-            from sqlalchemy import text
-            db = self.appbuilder.session
-
-            # 1. Create demo item "For What It's Worth"
-            item_result = db.execute(text("""
-                INSERT INTO items (item_id, title, notes, duration, description, "order", tuning, songbook, user_id, created_at, updated_at)
-                VALUES ('', 'For What It''s Worth',
-                    'There''s somethin'' happenin'' here...',
-                    '5',
-                    'Work on smooth transitions between E and A chords. Focus on strumming pattern and timing.',
-                    0, 'EADGBE',
-                    'C:\\Users\\Steven\\Documents\\Guitar\\Songbook\\ForWhatItsWorth',
-                    :user_id, NOW(), NOW())
-                RETURNING id, item_id
-            """), {'user_id': user.id})
-
-            item_row = item_result.fetchone()
-            item_db_id = item_row[0]  # Database primary key
-
-            # Update item_id to match database id (Google Sheets compatibility pattern)
-            db.execute(text("""
-                UPDATE items SET item_id = :item_id WHERE id = :id
-            """), {'item_id': str(item_db_id), 'id': item_db_id})
-
-            logger.info(f"Created demo item (id={item_db_id})")
-
-            # 2. Create demo routine "Demo routine"
-            routine_result = db.execute(text("""
-                INSERT INTO routines (name, "order", user_id, created_at)
-                VALUES ('Demo routine', 0, :user_id, NOW())
-                RETURNING id
-            """), {'user_id': user.id})
-
-            routine_id = routine_result.fetchone()[0]
-            logger.info(f"Created demo routine (id={routine_id})")
-
-            # 3. Add item to routine
-            db.execute(text("""
-                INSERT INTO routine_items (routine_id, item_id, "order", completed, created_at)
-                VALUES (:routine_id, :item_db_id, 0, FALSE, NOW())
-            """), {'routine_id': routine_id, 'item_db_id': item_db_id})
-
-            logger.info(f"Added item to routine")
-
-            # 4. Create 4 chord charts (E, A, E, A) with Intro section
-            # E chord (appears twice: positions 0 and 2)
-            e_chord_data = {
-                "fingers": [[2, 2, None], [3, 2, None], [4, 1, None]],
-                "barres": [],
-                "tuning": "EADGBE",
-                "capo": 0,
-                "startingFret": 1,
-                "numFrets": 4,
-                "numStrings": 6,
-                "openStrings": [1, 6],
-                "mutedStrings": [],
-                "sectionId": "section-intro",
-                "sectionLabel": "Intro",
-                "sectionRepeatCount": "",
-                "hasLineBreakAfter": False
-            }
-
-            # A chord (appears twice: positions 1 and 3)
-            a_chord_data = {
-                "fingers": [[2, 2, None], [3, 2, None], [4, 2, None]],
-                "barres": [],
-                "tuning": "EADGBE",
-                "capo": 0,
-                "startingFret": 1,
-                "numFrets": 4,
-                "numStrings": 6,
-                "openStrings": [1, 5],
-                "mutedStrings": [6],
-                "sectionId": "section-intro",
-                "sectionLabel": "Intro",
-                "sectionRepeatCount": "",
-                "hasLineBreakAfter": False
-            }
-
-            import json
-
-            # Create E, A, E, A progression
-            chord_sequence = [
-                ('E', e_chord_data, 0),
-                ('A', a_chord_data, 1),
-                ('E', e_chord_data, 2),
-                ('A', a_chord_data, 3)
-            ]
-
-            for title, chord_data, order in chord_sequence:
-                db.execute(text("""
-                    INSERT INTO chord_charts (item_id, title, chord_data, order_col, user_id, created_at)
-                    VALUES (:item_id, :title, :chord_data, :order_col, :user_id, NOW())
-                """), {
-                    'item_id': str(item_db_id),
-                    'title': title,
-                    'chord_data': json.dumps(chord_data),
-                    'order_col': order,
-                    'user_id': user.id
-                })
+            savepoint = db.begin_nested()
+
+            # Create demo item, demo routine, routine membership, chord charts and active
+            # routine (plus the free subscription itself, when requested) in one round-trip
+            demo_result = db.execute(_DEMO_DATA_SQL[bool(create_subscription)], {
+                'user_id': user.id,
+                'e_chord_data': _DEMO_E_CHORD_JSON,
+                'a_chord_data': _DEMO_A_CHORD_JSON
+            })
 
-            logger.info(f"Created 4 chord charts (E, A, E, A)")
+            item_db_id, routine_id = demo_result.fetchone()
+            savepoint.commit()
+            logger.info("Created demo item (id=%s) and demo routine (id=%s), set routine as active", item_db_id, routine_id)
+            logger.info("Created 4 chord charts (E, A, E, A)")
+            if create_subscription:
+                logger.info("Created free subscription for user %s", user.id)
 
-            # 5. Set demo routine as active in subscriptions.last_active_routine_id (per-user)
-            db.execute(text("""
-                UPDATE subscriptions
-                SET last_active_routine_id = :routine_id
-                WHERE user_id = :user_id
-            """), {'routine_id': routine_id, 'user_id': user.id})
+        except Exception as e:
+            logger.error("Failed to create demo data for user %s: %s", user.id, e)
+            logger.error(traceback.format_exc())
+            # Only the demo writes are undone; the caller's pending writes survive
+            if savepoint is not None and savepoint.is_active:
+                savepoint.rollback()
+            # Don't raise - fail silently to avoid blocking registration
 
-            logger.info(f"Set demo routine as active (routine_id={routine_id})")
+            if create_subscription:
+                # The subscription rolled back with the demo data; it's required, so insert it alone
+                try:
+                    db.execute(_FREE_SUBSCRIPTION_INSERT, {'user_id': user.id})
+                    logger.info("Created free subscription for user %s", user.id)
+                except Exception as e:
+                    logger.error("Failed to create subscription for user %s: %s", user.id, e)
+                    logger.error(traceback.format_exc())
 
+        try:
             db.commit()
-            logger.info(f"Demo data creation complete for user {user.id}")
-
+            logger.info("Demo data creation complete for user %s", user.id)
+            return True
         except Exception as e:
-            logger.error(f"Failed to create demo data for user {user.id}: {e}")
-            import traceback
+            logger.error("Failed to commit new user data for user %s: %s", user.id, e)
             logger.error(traceback.format_exc())
             db.rollback()
-            # Don't raise - fail silently to avoid blocking registration
+            return False
 
     def oauth_user_info(self, provider, response=None):
         """
@@ -1102,18 +1379,29 @@ class CustomSecurityManager(SecurityManager):
         """
         if provider == 'google':
             # Google OAuth response structure
-            me = self.appbuilder.sm.oauth_remotes[provider].get('userinfo')
-            data = me.json()
+            # Fetch userinfo over the shared keep-alive session rather than authlib's
+            # per-call client, so the callback reuses the TLS connection to googleapis
+            remote = self.appbuilder.sm.oauth_remotes[provider]
+            access_token = response.get('access_token') if response else None
+            if access_token:
+                me = _oauth_http.get(
+                    remote.api_base_url + 'userinfo',
+                    headers={'Authorization': f'Bearer {access_token}'},
+                    timeout=10
+                )
+            else:
+                me = remote.get('userinfo')
+            data = _oauth_userinfo_decoder.decode(me.content)
             email = data.get('email', '')
-            logger.info(f"Google OAuth user info: {email}")
+            logger.info("Google OAuth user info: %s", email)
 
-            # Generate unique username from email prefix
-            base_username = email.split('@')[0] if email else 'user'
-            unique_username = self.generate_unique_username(base_username)
+            # Username from email prefix; made unique only if this turns into a new
+            # account (create_oauth_user), so logins of existing users skip that work
+            base_username = (email.partition('@')[0] or 'user') if email else 'user'
 
             return {
                 'email': email,
-                'username': unique_username,
+                'username': base_username,
                 'first_name': data.get('given_name', ''),
                 'last_name': data.get('family_name', ''),
             }
@@ -1121,7 +1409,7 @@ class CustomSecurityManager(SecurityManager):
             # Tidal OAuth response structure (OAuth 2.1 with PKCE)
             # Tidal provides user_id in the token response, but no email/profile endpoint
             # We use user_id as the username and generate a placeholder email
-            logger.info(f"Tidal token response keys: {response.keys() if hasattr(response, 'keys') else type(response)}")
+            logger.info("Tidal token response keys: %s", response.keys() if hasattr(response, 'keys') else type(response))
 
             # Get user_id from token response
             user_id = response.get('user_id')
@@ -1129,7 +1417,7 @@ class CustomSecurityManager(SecurityManager):
                 logger.error("Tidal OAuth: No user_id in token response")
                 return None
 
-            logger.info(f"Tidal OAuth user_id: {user_id}")
+            logger.info("Tidal OAuth user_id: %s", user_id)
 
             # Use user_id as username (e.g., "tidal_185352085")
             username = f"tidal_{user_id}"
@@ -1,6 +1,8 @@
 """Subscription tier configuration and limits"""
 
-SUBSCRIPTION_TIERS = {
+from types import MappingProxyType
+
+_SUBSCRIPTION_TIERS = {
     'free': {
         'name': 'Free',
         'display_name': 'Free',
@@ -69,7 +71,25 @@ SUBSCRIPTION_TIERS = {
     },
 }
 
-def get_tier_limits(tier: str = None, is_complimentary: bool = False) -> dict:
+# Read-only views: get_tier_limits() hands the same tier config to every caller, so
+# an accidental write must fail instead of changing the limits for everyone
+SUBSCRIPTION_TIERS = MappingProxyType({
+    tier: MappingProxyType(config) for tier, config in _SUBSCRIPTION_TIERS.items()
+})
+
+# Fallback configs resolved once, so get_tier_limits() doesn't re-look them up per call
+_FREE_TIER = SUBSCRIPTION_TIERS['free']
+_COMPLIMENTARY_TIER = SUBSCRIPTION_TIERS['complimentary']
+
+# (tier, feature) -> enabled, built once from the '<feature>_enabled' keys above
+_FEATURE_TABLE = {
+    (tier, key[:-len('_enabled')]): value
+    for tier, config in SUBSCRIPTION_TIERS.items()
+    for key, value in config.items()
+    if key.endswith('_enabled')
+}
+
+def get_tier_limits(tier: str = None, is_complimentary: bool = False) -> MappingProxyType:
     """Get limits for a subscription tier
 
     Args:
@@ -77,17 +97,14 @@ def get_tier_limits(tier: str = None, is_complimentary: bool = False) -> dict:
         is_complimentary: Whether this is a complimentary account (overrides tier limits)
 
     Returns:
-        Dictionary with tier configuration including limits and features
+        Read-only mapping with tier configuration including limits and features
     """
     # Complimentary accounts get unlimited access
     if is_complimentary:
-        return SUBSCRIPTION_TIERS['complimentary']
+        return _COMPLIMENTARY_TIER
 
-    # Default to free tier if no tier specified
-    if tier is None:
-        tier = 'free'
-
-    return SUBSCRIPTION_TIERS.get(tier, SUBSCRIPTION_TIERS['free'])
+    # Default to free tier if no tier specified (None is never a key, so it falls through)
+    return SUBSCRIPTION_TIERS.get(tier, _FREE_TIER)
 
 def is_feature_enabled(tier: str = None, feature: str = None, is_complimentary: bool = False) -> bool:
     """Check if a feature is enabled for a tier
@@ -103,5 +120,10 @@ def is_feature_enabled(tier: str = None, feature: str = None, is_complimentary:
     if feature is None:
         return False
 
-    tier_config = get_tier_limits(tier, is_complimentary)
-    return tier_config.get(f'{feature}_enabled', False)
+    # Same tier resolution as get_tier_limits(): complimentary overrides, unknown -> free
+    if is_complimentary:
+        tier = 'complimentary'
+    elif tier not in SUBSCRIPTION_TIERS:
+        tier = 'free'
+
+    return _FEATURE_TABLE.get((tier, feature), False)
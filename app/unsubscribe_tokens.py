@@ -6,7 +6,9 @@ to unsubscribe without logging in.
 """
 from itsdangerous import URLSafeTimedSerializer, SignatureExpired, BadSignature
 from flask import current_app
+from functools import lru_cache
 import logging
+import msgspec
 
 logger = logging.getLogger(__name__)
 
@@ -14,6 +16,26 @@ logger = logging.getLogger(__name__)
 DEFAULT_TOKEN_EXPIRY = 30 * 24 * 60 * 60
 
 
+class _MsgspecJSON:
+    """itsdangerous payload serializer backed by msgspec (same compact JSON as the default)."""
+    _encoder = msgspec.json.Encoder()
+    _decoder = msgspec.json.Decoder()
+
+    @classmethod
+    def dumps(cls, obj) -> str:
+        return cls._encoder.encode(obj).decode()
+
+    @classmethod
+    def loads(cls, data):
+        return cls._decoder.decode(data)
+
+
+@lru_cache(maxsize=4)
+def get_serializer(secret_key: str) -> URLSafeTimedSerializer:
+    """Return the unsubscribe token serializer for a secret key, built once per key."""
+    return URLSafeTimedSerializer(secret_key, serializer=_MsgspecJSON)
+
+
 def generate_unsubscribe_token(user_id: int) -> str:
     """
     Generate a signed token for unsubscribing from inactivity emails.
@@ -28,7 +50,7 @@ def generate_unsubscribe_token(user_id: int) -> str:
         >>> token = generate_unsubscribe_token(42)
         >>> # Token can be used in: /unsubscribe/inactivity/{token}
     """
-    serializer = URLSafeTimedSerializer(current_app.config['SECRET_KEY'])
+    serializer = get_serializer(current_app.config['SECRET_KEY'])
 
     payload = {
         'user_id': user_id,
@@ -65,7 +87,7 @@ def validate_unsubscribe_token(token: str, max_age: int = None) -> dict:
         ... except BadSignature:
         ...     print("Invalid token")
     """
-    serializer = URLSafeTimedSerializer(current_app.config['SECRET_KEY'])
+    serializer = get_serializer(current_app.config['SECRET_KEY'])
 
     if max_age is None:
         max_age = DEFAULT_TOKEN_EXPIRY
@@ -2,11 +2,70 @@
 import os
 import logging
 import requests
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from sqlalchemy import text
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+# Shared keep-alive session so the deletion cron reuses the TLS connection to PostHog;
+# person deletion is idempotent, so transient 429/5xx responses are retried with backoff
+_http = requests.Session()
+_http.mount("https://", HTTPAdapter(
+    pool_maxsize=32,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 502, 503, 504])
+))
+
+# (connect, read) seconds per attempt: fail fast on a hang and let the retries cover it
+_POSTHOG_TIMEOUT = (3, 5)
+
+# PostHog person deletion runs after the account rows are committed, off the caller's
+# thread, so the deletion request doesn't wait on PostHog. Pending deletions still
+# finish before a cron process exits (executor threads are joined at shutdown).
+_posthog_delete_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='posthog-delete')
+
+# Every table holding a user's data, deleted child tables first; built once at import.
+# Each CTE returns one row per deleted row so the final SELECT can report counts.
+_DELETE_USER_DATA_SQL = text("""
+    WITH deleted_practice_events AS (
+        DELETE FROM practice_events WHERE user_id = :user_id RETURNING 1
+    ),
+    deleted_user_preferences AS (
+        DELETE FROM user_preferences WHERE user_id = :user_id RETURNING 1
+    ),
+    deleted_chord_charts AS (
+        DELETE FROM chord_charts WHERE user_id = :user_id RETURNING 1
+    ),
+    deleted_routine_items AS (
+        DELETE FROM routine_items
+        WHERE routine_id IN (SELECT id FROM routines WHERE user_id = :user_id)
+        RETURNING 1
+    ),
+    deleted_routines AS (
+        DELETE FROM routines WHERE user_id = :user_id RETURNING 1
+    ),
+    deleted_items AS (
+        DELETE FROM items WHERE user_id = :user_id RETURNING 1
+    ),
+    deleted_subscriptions AS (
+        DELETE FROM subscriptions WHERE user_id = :user_id RETURNING 1
+    ),
+    deleted_ab_user AS (
+        DELETE FROM ab_user WHERE id = :user_id RETURNING 1
+    )
+    SELECT
+        (SELECT count(*) FROM deleted_practice_events) AS practice_events,
+        (SELECT count(*) FROM deleted_user_preferences) AS user_preferences,
+        (SELECT count(*) FROM deleted_chord_charts) AS chord_charts,
+        (SELECT count(*) FROM deleted_routine_items) AS routine_items,
+        (SELECT count(*) FROM deleted_routines) AS routines,
+        (SELECT count(*) FROM deleted_items) AS items,
+        (SELECT count(*) FROM deleted_subscriptions) AS subscriptions,
+        (SELECT count(*) FROM deleted_ab_user) AS ab_user
+""")
+
 
 def delete_posthog_person_profile(user_id, email):
     """
@@ -38,7 +97,7 @@ def delete_posthog_person_profile(user_id, email):
             "distinct_id": email
         }
 
-        response = requests.delete(url, headers=headers, params=params, timeout=10)
+        response = _http.delete(url, headers=headers, params=params, timeout=_POSTHOG_TIMEOUT)
 
         if response.status_code == 204:
             logger.info(f"Successfully deleted PostHog person profile for user {user_id} ({email})")
@@ -55,7 +114,16 @@ def delete_posthog_person_profile(user_id, email):
         return False
 
 
-def delete_user_account(db, user_id, email):
+def schedule_posthog_person_deletion(user_id, email):
+    """
+    Delete a user's PostHog person profile in the background.
+
+    Call only once the account deletion is committed.
+    """
+    _posthog_delete_executor.submit(delete_posthog_person_profile, user_id, email)
+
+
+def delete_user_account(db, user_id, email, commit=True):
     """
     Permanently delete a user account and all associated data.
 
@@ -68,89 +136,53 @@ def delete_user_account(db, user_id, email):
     - All chord charts
     - All practice events
     - User preferences
-    - PostHog person profile
+    - PostHog person profile (in the background, after the commit)
 
     Args:
         db: Database session
         user_id: User's database ID
         email: User's email address
+        commit: If False, the caller owns the transaction: nothing is committed or rolled
+            back here, and the caller must call schedule_posthog_person_deletion() after
+            its own commit
 
     Returns:
-        bool: True if successful, False otherwise
+        bool: True if successful, False if the deletion failed or the user no longer existed
     """
     try:
         logger.info(f"Starting account deletion for user {user_id} ({email})")
 
-        # Delete PostHog person profile first (while we still have user_id/email)
-        delete_posthog_person_profile(user_id, email)
-
-        # Delete in reverse order of foreign key dependencies
-        # (child tables first, parent tables last)
-
-        # 1. Delete practice events
-        result = db.execute(text("""
-            DELETE FROM practice_events WHERE user_id = :user_id
-        """), {"user_id": user_id})
-        logger.info(f"Deleted {result.rowcount} practice events for user {user_id}")
-
-        # 2. Delete user preferences
-        result = db.execute(text("""
-            DELETE FROM user_preferences WHERE user_id = :user_id
-        """), {"user_id": user_id})
-        logger.info(f"Deleted user preferences for user {user_id}")
-
-        # 3. Delete chord charts
-        result = db.execute(text("""
-            DELETE FROM chord_charts WHERE user_id = :user_id
-        """), {"user_id": user_id})
-        logger.info(f"Deleted {result.rowcount} chord charts for user {user_id}")
-
-        # 4. Delete routine_items (junction table)
-        # First get routine IDs for this user
-        routine_ids = db.execute(text("""
-            SELECT id FROM routines WHERE user_id = :user_id
-        """), {"user_id": user_id}).fetchall()
-
-        if routine_ids:
-            routine_id_list = [r[0] for r in routine_ids]
-            placeholders = ','.join([f':id_{i}' for i in range(len(routine_id_list))])
-            params = {f'id_{i}': rid for i, rid in enumerate(routine_id_list)}
-
-            result = db.execute(text(f"""
-                DELETE FROM routine_items WHERE routine_id IN ({placeholders})
-            """), params)
-            logger.info(f"Deleted {result.rowcount} routine items for user {user_id}")
-
-        # 5. Delete routines
-        result = db.execute(text("""
-            DELETE FROM routines WHERE user_id = :user_id
-        """), {"user_id": user_id})
-        logger.info(f"Deleted {result.rowcount} routines for user {user_id}")
-
-        # 6. Delete items
-        result = db.execute(text("""
-            DELETE FROM items WHERE user_id = :user_id
-        """), {"user_id": user_id})
-        logger.info(f"Deleted {result.rowcount} items for user {user_id}")
-
-        # 7. Delete subscription
-        result = db.execute(text("""
-            DELETE FROM subscriptions WHERE user_id = :user_id
-        """), {"user_id": user_id})
-        logger.info(f"Deleted subscription for user {user_id}")
-
-        # 8. Finally, delete user from ab_user
-        result = db.execute(text("""
-            DELETE FROM ab_user WHERE id = :user_id
-        """), {"user_id": user_id})
-        logger.info(f"Deleted ab_user record for user {user_id}")
-
-        db.commit()
+        # Delete all of the user's rows in one statement (one round-trip). Sibling
+        # CTEs all see the pre-statement snapshot, so routine_items can still find the
+        # user's routines, and FK checks run once at the end of the statement.
+        counts = db.execute(_DELETE_USER_DATA_SQL, {"user_id": user_id}).one()
+        logger.info(
+            f"Deleted for user {user_id}: {counts.practice_events} practice events, "
+            f"{counts.user_preferences} user preferences, {counts.chord_charts} chord charts, "
+            f"{counts.routine_items} routine items, {counts.routines} routines, "
+            f"{counts.items} items, {counts.subscriptions} subscription, "
+            f"{counts.ab_user} ab_user record"
+        )
+
+        if commit:
+            db.commit()
+
+        if not counts.ab_user:
+            # Already deleted (e.g. a repeated or concurrent request): nothing to report,
+            # so callers skip the farewell email and PostHog is left to the first deletion
+            logger.warning(f"No ab_user record found for user {user_id}; account was already deleted")
+            return False
+
         logger.info(f"Successfully completed account deletion for user {user_id}")
+
+        # Delete PostHog person profile in the background now that the data is gone
+        if commit:
+            schedule_posthog_person_deletion(user_id, email)
         return True
 
     except Exception as e:
-        db.rollback()
+        if commit:
+            db.rollback()
         logger.error(f"Error during account deletion for user {user_id}: {e}")
         import traceback
         logger.error(traceback.format_exc())
@@ -6,9 +6,42 @@ and are sent via Mailgun for various deletion events.
 """
 
 import os
+import html
+import json
+import logging
+from pathlib import Path
 import requests
+from jinja2 import Environment, FileSystemLoader
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from typing import Dict, Any
 
+logger = logging.getLogger(__name__)
+
+# Mailgun accepts at most 1000 recipients per batch send
+MAILGUN_BATCH_SIZE = 1000
+
+# Shared keep-alive session so consecutive sends reuse the TLS connection to Mailgun.
+# Retry's default allowed_methods excludes POST, so a send is never repeated.
+_http = requests.Session()
+_http.mount("https://", HTTPAdapter(
+    pool_maxsize=32,
+    max_retries=Retry(total=3, backoff_factor=0.2, status_forcelist=[429, 502, 503, 504])
+))
+
+# Email bodies live in app/templates/email/ and are compiled once at import; a plain
+# FileSystemLoader keeps them usable from the cron jobs, outside any Flask app context.
+# Autoescaped, since usernames are user-supplied and end up in the HTML.
+_email_env = Environment(
+    loader=FileSystemLoader(Path(__file__).resolve().parent.parent / 'templates' / 'email'),
+    autoescape=True
+)
+_SCHEDULED_DELETION_CONFIRMATION_TEMPLATE = _email_env.get_template('scheduled_deletion_confirmation.html.jinja')
+_IMMEDIATE_DELETION_FAREWELL_TEMPLATE = _email_env.get_template('immediate_deletion_farewell.html.jinja')
+_DELETION_CANCELED_TEMPLATE = _email_env.get_template('deletion_canceled.html.jinja')
+_INACTIVITY_NOTIFICATION_TEMPLATE = _email_env.get_template('inactivity_notification.html.jinja')
+_FINAL_DELETION_SCHEDULED_TEMPLATE = _email_env.get_template('final_deletion_scheduled.html.jinja')
+
 
 def send_mailgun_email(to_email: str, subject: str, html_body: str) -> bool:
     """
@@ -26,11 +59,11 @@ def send_mailgun_email(to_email: str, subject: str, html_body: str) -> bool:
     mailgun_domain = os.getenv('MAILGUN_DOMAIN')
 
     if not mailgun_api_key or not mailgun_domain:
-        print("Error: Mailgun credentials not configured")
+        logger.error("Mailgun credentials not configured")
         return False
 
     try:
-        response = requests.post(
+        response = _http.post(
             f"https://api.mailgun.net/v3/{mailgun_domain}/messages",
             auth=("api", mailgun_api_key),
             data={
@@ -43,7 +76,54 @@ def send_mailgun_email(to_email: str, subject: str, html_body: str) -> bool:
 
         return response.status_code == 200
     except Exception as e:
-        print(f"Error sending email: {e}")
+        logger.error(f"Error sending email: {e}", exc_info=True)
+        return False
+
+
+def send_mailgun_batch(
+    subject: str,
+    html_template: str,
+    recipient_variables: Dict[str, Dict[str, Any]]
+) -> bool:
+    """
+    Send one personalized email to many recipients in a single Mailgun API call.
+
+    Uses Mailgun batch sending: html_template contains %recipient.<name>%
+    placeholders that Mailgun fills per recipient, and each recipient only
+    sees their own address.
+
+    Args:
+        subject: Email subject line
+        html_template: HTML email body with %recipient.<name>% placeholders
+        recipient_variables: {email: {name: value}} for each recipient
+            (at most MAILGUN_BATCH_SIZE)
+
+    Returns:
+        True if successful, False otherwise
+    """
+    mailgun_api_key = os.getenv('MAILGUN_API_KEY')
+    mailgun_domain = os.getenv('MAILGUN_DOMAIN')
+
+    if not mailgun_api_key or not mailgun_domain:
+        logger.error("Mailgun credentials not configured")
+        return False
+
+    try:
+        response = _http.post(
+            f"https://api.mailgun.net/v3/{mailgun_domain}/messages",
+            auth=("api", mailgun_api_key),
+            data={
+                "from": f"GPRA <noreply@{mailgun_domain}>",
+                "to": list(recipient_variables),
+                "subject": subject,
+                "html": html_template,
+                "recipient-variables": json.dumps(recipient_variables)
+            }
+        )
+
+        return response.status_code == 200
+    except Exception as e:
+        logger.error(f"Error sending batch email: {e}", exc_info=True)
         return False
 
 
@@ -64,62 +144,11 @@ def scheduled_deletion_confirmation_email(
     """
     subject = f"Your GPRA account will be deleted on {deletion_date}"
 
-    html_body = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <style>
-            body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-            .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-            .header {{ background-color: #ea580c; color: white; padding: 20px; text-align: center; }}
-            .content {{ padding: 20px; background-color: #f9fafb; }}
-            .footer {{ padding: 20px; text-align: center; font-size: 12px; color: #666; }}
-            .button {{ display: inline-block; padding: 12px 24px; background-color: #ea580c; color: white; text-decoration: none; border-radius: 5px; }}
-            .warning {{ background-color: #fef3c7; border-left: 4px solid #f59e0b; padding: 15px; margin: 20px 0; }}
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <div class="header">
-                <h1>Account Deletion Scheduled</h1>
-            </div>
-            <div class="content">
-                <p>Hi {username},</p>
-
-                <p>We've received your request to delete your GPRA account. Here's what you need to know:</p>
-
-                <div class="warning">
-                    <strong>Deletion Date:</strong> {deletion_date}<br>
-                    <strong>Refund Amount:</strong> ${refund_amount:.2f}
-                </div>
-
-                <h3>What happens now:</h3>
-                <ul>
-                    <li>Your subscription has been canceled</li>
-                    <li>You'll receive a prorated refund of <strong>${refund_amount:.2f}</strong></li>
-                    <li>Your account will stay active until <strong>{deletion_date}</strong></li>
-                    <li>You can continue using GPRA until that date</li>
-                    <li>On {deletion_date}, all your data will be permanently deleted</li>
-                </ul>
-
-                <h3>Changed your mind?</h3>
-                <p>You can cancel this deletion anytime before {deletion_date} from your Account Settings.</p>
-
-                <p style="text-align: center; margin-top: 30px;">
-                    <a href="https://guitarpracticeroutine.com/" class="button">Go to Account Settings</a>
-                </p>
-
-                <p style="margin-top: 30px; font-size: 14px; color: #666;">
-                    <strong>P.S.</strong> Your refund will appear in your account within 5-10 business days.
-                </p>
-            </div>
-            <div class="footer">
-                <p>Guitar Practice Routine App</p>
-            </div>
-        </div>
-    </body>
-    </html>
-    """
+    html_body = _SCHEDULED_DELETION_CONFIRMATION_TEMPLATE.render(
+        username=username,
+        deletion_date=deletion_date,
+        refund_amount=refund_amount
+    )
 
     return send_mailgun_email(to_email, subject, html_body)
 
@@ -137,54 +166,7 @@ def immediate_deletion_farewell_email(
     """
     subject = "Your GPRA account has been deleted"
 
-    html_body = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <style>
-            body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-            .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-            .header {{ background-color: #991b1b; color: white; padding: 20px; text-align: center; }}
-            .content {{ padding: 20px; background-color: #f9fafb; }}
-            .footer {{ padding: 20px; text-align: center; font-size: 12px; color: #666; }}
-            .info {{ background-color: #dbeafe; border-left: 4px solid: #3b82f6; padding: 15px; margin: 20px 0; }}
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <div class="header">
-                <h1>Account Deleted</h1>
-            </div>
-            <div class="content">
-                <p>Hi {username},</p>
-
-                <p>Your GPRA account has been permanently deleted, as requested.</p>
-
-                <h3>What was removed:</h3>
-                <ul>
-                    <li>All practice items and routines</li>
-                    <li>All chord charts</li>
-                    <li>Practice history</li>
-                    <li>Account settings and preferences</li>
-                </ul>
-
-                <div class="info">
-                    <strong>Important:</strong> This action is permanent and cannot be undone. All your data has been permanently erased.
-                </div>
-
-                <p>We're sorry to see you go! If you ever decide to come back, you'll need to create a new account from scratch.</p>
-
-                <p style="margin-top: 30px;">
-                    Thanks for practicing with GPRA. Keep playing that guitar! 🎸
-                </p>
-            </div>
-            <div class="footer">
-                <p>Guitar Practice Routine App</p>
-            </div>
-        </div>
-    </body>
-    </html>
-    """
+    html_body = _IMMEDIATE_DELETION_FAREWELL_TEMPLATE.render(username=username)
 
     return send_mailgun_email(to_email, subject, html_body)
 
@@ -202,60 +184,30 @@ def deletion_canceled_email(
     """
     subject = "Welcome back to GPRA! 🎉"
 
-    html_body = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <style>
-            body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-            .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-            .header {{ background-color: #16a34a; color: white; padding: 20px; text-align: center; }}
-            .content {{ padding: 20px; background-color: #f9fafb; }}
-            .footer {{ padding: 20px; text-align: center; font-size: 12px; color: #666; }}
-            .button {{ display: inline-block; padding: 12px 24px; background-color: #ea580c; color: white; text-decoration: none; border-radius: 5px; }}
-            .success {{ background-color: #dcfce7; border-left: 4px solid #16a34a; padding: 15px; margin: 20px 0; }}
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <div class="header">
-                <h1>🎉 Welcome Back! 🎉</h1>
-            </div>
-            <div class="content">
-                <p>Hi {username},</p>
-
-                <p>Great news! You've successfully canceled your account deletion.</p>
-
-                <div class="success">
-                    <strong>Your account is safe!</strong><br>
-                    Your subscription is active again and all your data is secure.
-                </div>
-
-                <h3>What this means:</h3>
-                <ul>
-                    <li>Your subscription has been reactivated</li>
-                    <li>All your practice items and routines are still here</li>
-                    <li>All your chord charts are preserved</li>
-                    <li>Your account will NOT be deleted</li>
-                </ul>
-
-                <p>We're glad you're staying with GPRA! Let's keep those practice sessions going. 🎸</p>
-
-                <p style="text-align: center; margin-top: 30px;">
-                    <a href="https://guitarpracticeroutine.com/" class="button">Continue Practicing</a>
-                </p>
-            </div>
-            <div class="footer">
-                <p>Guitar Practice Routine App</p>
-            </div>
-        </div>
-    </body>
-    </html>
-    """
+    html_body = _DELETION_CANCELED_TEMPLATE.render(username=username)
 
     return send_mailgun_email(to_email, subject, html_body)
 
 
+_INACTIVITY_SUBJECT = "You're paying for GPRA but you're not using it"
+_INACTIVITY_UNSUBSCRIBE_URL = "https://guitarpracticeroutine.com/api/unsubscribe/inactivity/{token}"
+_INACTIVITY_ACCOUNT_SETTINGS_URL = "https://guitarpracticeroutine.com/#Account"
+
+
+def _inactivity_notification_html(greeting: str, unsubscribe_url: str) -> str:
+    """Build the inactivity email body (values may be Mailgun %recipient.*% placeholders)."""
+    return _INACTIVITY_NOTIFICATION_TEMPLATE.render(
+        greeting=greeting,
+        unsubscribe_url=unsubscribe_url,
+        account_settings_url=_INACTIVITY_ACCOUNT_SETTINGS_URL
+    )
+
+
+def _inactivity_greeting(username: str) -> str:
+    """Greeting line, e.g. "Hey alice" (just "Hey" if there's no username)."""
+    return f"Hey {username}" if username else "Hey"
+
+
 def inactivity_notification_email(
     to_email: str,
     username: str,
@@ -269,57 +221,45 @@ def inactivity_notification_email(
         username: User's username
         unsubscribe_token: JWT token for one-click unsubscribe
     """
-    subject = "You're paying for GPRA but you're not using it"
-
-    # Build unsubscribe URL
-    unsubscribe_url = f"https://guitarpracticeroutine.com/api/unsubscribe/inactivity/{unsubscribe_token}"
-    account_settings_url = "https://guitarpracticeroutine.com/#Account"
-
-    html_body = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <style>
-            body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-            .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-            .header {{ background-color: #ea580c; color: white; padding: 20px; text-align: center; }}
-            .content {{ padding: 20px; background-color: #f9fafb; }}
-            .footer {{ padding: 20px; text-align: center; font-size: 12px; color: #666; }}
-            .button {{ display: inline-block; padding: 12px 24px; background-color: #ea580c; color: white; text-decoration: none; border-radius: 5px; }}
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <div class="header">
-                <h1>Did you know you're still paying me monthly?</h1>
-            </div>
-            <div class="content">
-                <p>Hey{' ' + username if username else ''},</p>
-
-                <p>This is an automated email. It's sent if you haven't used GPRA in over 90 days, but you're still subscribed and paying for it.</p>
-
-                <p>I'm guessing you forgot about it, so, <a href="{account_settings_url}">click here to log in and pause or cancel your subscription</a>. Scroll to the bottom, and expand the "Danger zone" at the bottom of the left column for pause and cancel options. (If that link doesn't take you to the Account / Settings page, then click the gear icon in the top right corner of the page.)</p>
-
-                <p>Or, if you want to keep paying without using it, perhaps as a way of encouraging yourself to get back to practicing regularly, then: Thanks, that's really generous of you, and I really appreciate it!</p>
-
-                <p style="margin-top: 30px;">
-                    Rock on <span style="font-size: 1.2em;">&#129304;</span>,<br>
-                    ~Steven<br>
-                    Guitar Practice Routine App
-                </p>
-            </div>
-            <div class="footer">
-                <p>Guitar Practice Routine App</p>
-                <p style="margin-top: 20px; font-size: 11px;">
-                    <a href="{unsubscribe_url}" style="color: #666;">Stop receiving these inactivity reminder emails</a>
-                </p>
-            </div>
-        </div>
-    </body>
-    </html>
+    html_body = _inactivity_notification_html(
+        _inactivity_greeting(username),
+        _INACTIVITY_UNSUBSCRIBE_URL.format(token=unsubscribe_token)
+    )
+
+    return send_mailgun_email(to_email, _INACTIVITY_SUBJECT, html_body)
+
+
+# Built once: the batch body is the same for every recipient, Mailgun fills in the rest
+_INACTIVITY_BATCH_HTML = _inactivity_notification_html(
+    '%recipient.greeting%',
+    '%recipient.unsubscribe_url%'
+)
+
+
+def inactivity_notification_batch(recipients) -> bool:
     """
+    Send the 90-day inactivity notification to many subscribers in one API call.
 
-    return send_mailgun_email(to_email, subject, html_body)
+    Args:
+        recipients: Iterable of (email, username, unsubscribe_token) tuples
+            (at most MAILGUN_BATCH_SIZE)
+
+    Returns:
+        True if Mailgun accepted the batch, False otherwise
+    """
+    # Mailgun substitutes recipient variables into the HTML verbatim, so escape them
+    # here the way the template would
+    recipient_variables = {
+        email: {
+            'greeting': html.escape(_inactivity_greeting(username)),
+            'unsubscribe_url': _INACTIVITY_UNSUBSCRIBE_URL.format(token=unsubscribe_token),
+        }
+        for email, username, unsubscribe_token in recipients
+    }
+    if not recipient_variables:
+        return True
+
+    return send_mailgun_batch(_INACTIVITY_SUBJECT, _INACTIVITY_BATCH_HTML, recipient_variables)
 
 
 def final_deletion_scheduled_email(
@@ -339,57 +279,10 @@ def final_deletion_scheduled_email(
     """
     subject = "Your GPRA account has been deleted"
 
-    html_body = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <style>
-            body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-            .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-            .header {{ background-color: #991b1b; color: white; padding: 20px; text-align: center; }}
-            .content {{ padding: 20px; background-color: #f9fafb; }}
-            .footer {{ padding: 20px; text-align: center; font-size: 12px; color: #666; }}
-            .info {{ background-color: #dbeafe; border-left: 4px solid #3b82f6; padding: 15px; margin: 20px 0; }}
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <div class="header">
-                <h1>Account Deleted as Scheduled</h1>
-            </div>
-            <div class="content">
-                <p>Hi {username},</p>
-
-                <p>As scheduled, your GPRA account has been permanently deleted on {deletion_date}.</p>
-
-                <h3>What was removed:</h3>
-                <ul>
-                    <li>All practice items and routines</li>
-                    <li>All chord charts</li>
-                    <li>Practice history</li>
-                    <li>Account settings and preferences</li>
-                </ul>
-
-                <h3>Your refund:</h3>
-                <div class="info">
-                    <strong>Refund Amount:</strong> ${refund_amount:.2f}<br>
-                    <strong>Processing Time:</strong> 5-10 business days<br>
-                    <br>
-                    Your refund will appear in the original payment method.
-                </div>
-
-                <p>Thanks for using GPRA! We hope it helped you with your guitar practice journey. Keep playing and keep improving! 🎸</p>
-
-                <p style="margin-top: 30px; font-size: 14px; color: #666;">
-                    If you ever decide to come back, you're always welcome to create a new account.
-                </p>
-            </div>
-            <div class="footer">
-                <p>Guitar Practice Routine App</p>
-            </div>
-        </div>
-    </body>
-    </html>
-    """
+    html_body = _FINAL_DELETION_SCHEDULED_TEMPLATE.render(
+        username=username,
+        deletion_date=deletion_date,
+        refund_amount=refund_amount
+    )
 
     return send_mailgun_email(to_email, subject, html_body)
@@ -7,14 +7,39 @@ The encryption key is derived from SECRET_KEY in the environment.
 import os
 import base64
 import hashlib
+import anthropic
+import httpx
+from cachetools import TTLCache
 from cryptography.fernet import Fernet
+from functools import lru_cache
+import threading
 from typing import Optional
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Recent definitive API key validation results, keyed by SHA-256 of the key (never the
+# plaintext). TTLCache isn't thread-safe on its own, hence the lock.
+_validation_cache = TTLCache(maxsize=1024, ttl=300)
+_validation_cache_lock = threading.Lock()
 
-def _get_fernet_key() -> bytes:
+# One keep-alive connection pool for validation calls, shared by the per-key Anthropic
+# clients so repeat validations skip the DNS lookup and TLS handshake. httpx clients are
+# thread-safe; the pool lives for the whole process.
+_validation_http = anthropic.DefaultHttpxClient(
+    limits=httpx.Limits(max_connections=10, max_keepalive_connections=10),
+)
+
+
+def _get_secret() -> str:
+    """Return SECRET_KEY from the environment, raising ValueError if it isn't set."""
+    secret = os.getenv('SECRET_KEY')
+    if not secret:
+        raise ValueError("SECRET_KEY not set in environment")
+    return secret
+
+
+def _derive_fernet_key(secret: str) -> bytes:
     """
     Derive a Fernet-compatible key from SECRET_KEY.
 
@@ -24,10 +49,6 @@ def _get_fernet_key() -> bytes:
     Returns:
         bytes: Base64-encoded 32-byte key suitable for Fernet
     """
-    secret = os.getenv('SECRET_KEY')
-    if not secret:
-        raise ValueError("SECRET_KEY not set in environment")
-
     # Hash the secret key to get exactly 32 bytes
     hashed = hashlib.sha256(secret.encode()).digest()
 
@@ -35,6 +56,22 @@ def _get_fernet_key() -> bytes:
     return base64.urlsafe_b64encode(hashed)
 
 
+@lru_cache(maxsize=4)
+def _fernet_for_secret(secret: str) -> Fernet:
+    """Fernet instance for a given secret; key derivation runs once per secret."""
+    return Fernet(_derive_fernet_key(secret))
+
+
+def _get_fernet() -> Fernet:
+    """
+    Return the Fernet instance for the current SECRET_KEY.
+
+    Keyed on the secret itself (like security._oauth_state_hmac), so a changed
+    SECRET_KEY picks up a new key without any cache reset.
+    """
+    return _fernet_for_secret(_get_secret())
+
+
 def encrypt_api_key(api_key: str) -> bytes:
     """
     Encrypt an API key for secure storage.
@@ -52,7 +89,7 @@ def encrypt_api_key(api_key: str) -> bytes:
         raise ValueError("API key cannot be empty")
 
     try:
-        fernet = Fernet(_get_fernet_key())
+        fernet = _get_fernet()
         encrypted = fernet.encrypt(api_key.encode())
         logger.debug("API key encrypted successfully")
         return encrypted
@@ -82,7 +119,7 @@ def decrypt_api_key(encrypted_key: bytes) -> Optional[str]:
             # Handle other types by converting to bytes
             encrypted_key = bytes(encrypted_key)
 
-        fernet = Fernet(_get_fernet_key())
+        fernet = _get_fernet()
         decrypted = fernet.decrypt(encrypted_key)
         return decrypted.decode()
     except Exception as e:
@@ -112,11 +149,32 @@ def validate_anthropic_api_key(api_key: str) -> tuple[bool, str]:
     if len(api_key) < 40:
         return False, "API key is too short"
 
+    # Repeat validations of the same key (retries, double submits) reuse the last
+    # definitive answer instead of making another billable API call
+    cache_key = hashlib.sha256(api_key.encode()).digest()
+    with _validation_cache_lock:
+        cached = _validation_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    is_valid, error_message, definitive = _check_api_key_with_anthropic(api_key)
+    if definitive:
+        with _validation_cache_lock:
+            _validation_cache[cache_key] = (is_valid, error_message)
+    return is_valid, error_message
+
+
+def _check_api_key_with_anthropic(api_key: str) -> tuple[bool, str, bool]:
+    """
+    Validate an API key with a minimal Anthropic API call.
+
+    Returns:
+        tuple[bool, str, bool]: (is_valid, error_message, definitive), where definitive
+            is False for transient or unexpected errors that shouldn't be cached
+    """
     # Test the key with a minimal API call
     try:
-        import anthropic
-
-        client = anthropic.Anthropic(api_key=api_key)
+        client = anthropic.Anthropic(api_key=api_key, http_client=_validation_http, timeout=10.0)
 
         # Make a minimal test call (very cheap, just validates auth)
         # Use the messages.count_tokens endpoint which doesn't consume credits
@@ -131,25 +189,22 @@ def validate_anthropic_api_key(api_key: str) -> tuple[bool, str]:
 
             # If we got here, the key is valid
             logger.info("API key validation successful")
-            return True, ""
+            return True, "", True
 
         except anthropic.AuthenticationError as e:
             logger.warning(f"API key authentication failed: {e}")
-            return False, "Invalid API key - authentication failed"
+            return False, "Invalid API key - authentication failed", True
         except anthropic.PermissionDeniedError as e:
             logger.warning(f"API key permission denied: {e}")
-            return False, "API key does not have required permissions"
+            return False, "API key does not have required permissions", True
         except anthropic.RateLimitError as e:
             # Rate limit means the key is valid, just throttled
             logger.info("API key valid but rate limited during validation")
-            return True, ""
+            return True, "", True
         except Exception as e:
             logger.error(f"Unexpected error validating API key: {e}")
-            return False, f"Error validating API key: {str(e)}"
+            return False, f"Error validating API key: {str(e)}", False
 
-    except ImportError:
-        logger.error("anthropic package not installed")
-        return False, "Server configuration error (anthropic package missing)"
     except Exception as e:
         logger.error(f"Error during API key validation: {e}")
-        return False, f"Error validating API key: {str(e)}"
+        return False, f"Error validating API key: {str(e)}", False
@@ -9,37 +9,92 @@ that aren't captured by auto-instrumentation.
 
 import os
 import time
-import uuid
+import itertools
+import threading
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any, List, Optional
 
 logger = logging.getLogger(__name__)
 
 # Import PostHog SDK client and helper functions
 try:
-    from app.utils.posthog_client import posthog_client, get_posthog_distinct_id
+    from app.utils.posthog_client import posthog_client, get_posthog_distinct_id, request_distinct_id
     POSTHOG_AVAILABLE = posthog_client is not None
 except ImportError:
     logger.warning("PostHog client not available, manual LLM tracking disabled")
     posthog_client = None
     get_posthog_distinct_id = None
+    request_distinct_id = None
     POSTHOG_AVAILABLE = False
 
+# Environment label attached to every span; resolved once at import
+ENVIRONMENT = os.getenv("FLASK_ENV", "production")
+
+# Fixed properties of every $ai_generation event; per-event values are merged on top
+_GENERATION_TEMPLATE = {
+    "$ai_provider": "anthropic",
+    "$ai_span_name": "chord_extraction_generation",
+    "$ai_is_error": False,
+}
+
+# Events are sent off the request thread: resolving the distinct_id can query ab_user,
+# and capture() serializes properties. Executor threads are joined at interpreter exit
+# before atexit handlers run, so queued events still reach posthog_client before the
+# shutdown flush registered in app/__init__.py.
+_ANALYTICS_EXECUTOR = ThreadPoolExecutor(max_workers=2, thread_name_prefix="llm-analytics")
+
+
+# Shed LLM events once the PostHog SDK's send queue is 80% full (max_queue_size is 10000
+# in posthog_client.py); the SDK would drop them anyway, so skip building them
+_QUEUE_SHED_THRESHOLD = 8000
+_dropped_events = itertools.count(1)
+
+
+def _queue_has_room() -> bool:
+    """False (and counts a dropped event) when the PostHog send queue is nearly full"""
+    queue = getattr(posthog_client, "queue", None)
+    if queue is None or queue.qsize() < _QUEUE_SHED_THRESHOLD:
+        return True
+
+    dropped = next(_dropped_events)
+    if dropped % 1000 == 1:
+        logger.warning(f"PostHog queue saturated, dropping LLM analytics events ({dropped} dropped so far)")
+    return False
+
+
+def _new_id() -> str:
+    """Random 128-bit trace/span ID in the usual 8-4-4-4-12 form (opaque to PostHog)"""
+    h = os.urandom(16).hex()
+    return f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
+
+
 class LLMAnalytics:
     """Utility class for tracking LLM interactions with PostHog LLM Analytics"""
 
     def __init__(self):
         self.enabled = POSTHOG_AVAILABLE
-        self.current_trace_id = None
+        # The instance is a module-level singleton shared by all request threads, so the
+        # current trace is kept per thread: concurrent requests don't share trace IDs
+        self._tls = threading.local()
 
         if not self.enabled:
             logger.warning("PostHog API key not found. LLM Analytics disabled.")
         else:
             logger.info("PostHog LLM Analytics enabled")
 
+    @property
+    def current_trace_id(self) -> Optional[str]:
+        """Trace ID of the calling thread's current trace, if any"""
+        return getattr(self._tls, "trace_id", None)
+
+    @current_trace_id.setter
+    def current_trace_id(self, trace_id: Optional[str]) -> None:
+        self._tls.trace_id = trace_id
+
     def start_trace(self, trace_name: str = "autocreate_chord_charts") -> str:
         """Start a new trace and return the trace ID"""
-        self.current_trace_id = str(uuid.uuid4())
+        self.current_trace_id = _new_id()
         logger.info(f"Started LLM Analytics trace: {self.current_trace_id}")
         return self.current_trace_id
 
@@ -79,10 +134,10 @@ class LLMAnalytics:
         Returns:
             Generation ID for linking spans
         """
-        if not self.enabled:
-            return str(uuid.uuid4())
+        if not self.enabled or not _queue_has_room():
+            return _new_id()
 
-        generation_id = str(uuid.uuid4())
+        generation_id = _new_id()
 
         # Use provided trace_id or current trace_id or create new one
         if not trace_id:
@@ -93,45 +148,40 @@ class LLMAnalytics:
         else:
             trace_id = trace_id
 
-        # Build the event properties following PostHog LLM Analytics format (matching Elixir)
+        # Build the event properties following PostHog LLM Analytics format (matching Elixir):
+        # fixed provider/span name from the template, then the per-event values
         properties = {
+            **_GENERATION_TEMPLATE,
             # MANDATORY PostHog LLM properties (from working Elixir implementation)
             "$ai_input": input_messages if not privacy_mode else None,
             "$ai_output_choices": output_choices if not privacy_mode else None,
-
-            # Core PostHog LLM properties
             "$ai_model": model,
-            "$ai_provider": "anthropic",
-
             # Tracing properties
             "$ai_trace_id": trace_id,
             "$ai_span_id": generation_id,
-            "$ai_span_name": "chord_extraction_generation",
         }
 
         # Add latency in seconds (as per PostHog LLM Analytics docs)
         if latency_seconds is not None:
             properties["$ai_latency"] = latency_seconds
 
-        # Input/output already handled above in mandatory properties
-
-        # Add usage information if available
+        # Add usage information if available (zero/missing counts are left out)
         if usage:
-            if usage.get("input_tokens"):
-                properties["$ai_input_tokens"] = usage["input_tokens"]
-            if usage.get("output_tokens"):
-                properties["$ai_output_tokens"] = usage["output_tokens"]
+            properties.update({
+                key: value for key, value in (
+                    ("$ai_input_tokens", usage.get("input_tokens")),
+                    ("$ai_output_tokens", usage.get("output_tokens")),
+                ) if value
+            })
 
         # Add tools if provided
         if tools:
             properties["$ai_tools"] = tools
 
-        # Add error information
+        # Add error information ($ai_is_error defaults to False from the template)
         if error:
             properties["$ai_is_error"] = True
             properties["error_message"] = error
-        else:
-            properties["$ai_is_error"] = False
 
         # Add custom properties
         if custom_properties:
@@ -176,10 +226,10 @@ class LLMAnalytics:
         Returns:
             Span ID
         """
-        if not self.enabled:
-            return str(uuid.uuid4())
+        if not self.enabled or not _queue_has_room():
+            return _new_id()
 
-        span_id = str(uuid.uuid4())
+        span_id = _new_id()
         end_time = end_time or time.time()
 
         properties = {
@@ -194,7 +244,7 @@ class LLMAnalytics:
 
             # Context
             "app_name": "Guitar Practice Routine App",
-            "environment": os.getenv("FLASK_ENV", "production"),
+            "environment": ENVIRONMENT,
         }
 
         # Link to parent span or generation
@@ -216,10 +266,17 @@ class LLMAnalytics:
         return span_id
 
     def _capture_event(self, event_name: str, properties: Dict[str, Any]):
-        """Send event to PostHog using Python SDK"""
+        """Queue event for sending to PostHog (see _send_event)"""
         if not self.enabled or not posthog_client:
             return
 
+        # Resolve the request user's distinct_id here, while flask.g is still available;
+        # _send_event only queries for it when the event isn't for the request's user
+        distinct_id = request_distinct_id(properties.get('user_id'))
+        _ANALYTICS_EXECUTOR.submit(self._send_event, event_name, properties, distinct_id)
+
+    def _send_event(self, event_name: str, properties: Dict[str, Any], distinct_id: Optional[str] = None):
+        """Send event to PostHog using Python SDK (runs on the analytics executor)"""
         # Get user_id from properties - CRITICAL for multi-tenant analytics
         user_id = properties.get('user_id')
 
@@ -231,8 +288,9 @@ class LLMAnalytics:
             if user_id:
                 # Use get_posthog_distinct_id() for consistent distinct_id
                 # This ensures LLM events use the same distinct_id as all other events
-                # (email for regular users, tidalNNNNN for Tidal OAuth users)
-                distinct_id = get_posthog_distinct_id(user_id)
+                # (email for regular users, tidalNNNNN for Tidal OAuth users).
+                # Events for the request's own user arrive with it precomputed.
+                distinct_id = distinct_id or get_posthog_distinct_id(user_id)
             else:
                 # Log warning for missing user_id - this shouldn't happen for authenticated endpoints
                 # but we still capture the event with a system-level distinct_id for debugging
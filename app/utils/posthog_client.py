@@ -9,8 +9,12 @@ Provides:
 
 import os
 import logging
-from typing import Dict, Any, Optional
+import threading
+from typing import Dict, Any, Optional, Tuple
+from cachetools import TTLCache
+from flask import g, has_request_context
 from posthog import Posthog
+from sqlalchemy import text
 
 logger = logging.getLogger(__name__)
 
@@ -23,6 +27,13 @@ if posthog_api_key:
         project_api_key=posthog_api_key,
         host=posthog_host,
         debug=os.getenv('FLASK_ENV') == 'development',
+        # Batch events in the background consumer: wait up to 2s (SDK default 0.5s) or
+        # 100 events before posting, so the $ai_span/$ai_generation burst from one
+        # request goes out in one HTTPS request. Events reach PostHog a little later;
+        # shutdown() still flushes whatever is queued on exit.
+        flush_at=100,
+        flush_interval=2.0,
+        max_queue_size=10000,
         on_error=lambda e, batch: logger.error(f"PostHog error: {e}")
     )
     logger.info("PostHog Python SDK initialized")
@@ -30,6 +41,30 @@ else:
     posthog_client = None
     logger.warning("PostHog API key not found. Event tracking disabled.")
 
+# Short-lived per-user lookups for event enrichment, so a burst of events for one user
+# doesn't query ab_user/subscriptions per event. Only found values are cached; TTLs
+# bound how long an email or tier change takes to show up in analytics.
+_user_email_cache = TTLCache(maxsize=4096, ttl=300)
+_user_tier_cache = TTLCache(maxsize=4096, ttl=60)
+_user_cache_lock = threading.Lock()
+
+# Enrichment queries, built once at import
+_USER_EMAIL_SQL = text("""
+    SELECT email
+    FROM ab_user
+    WHERE id = :user_id
+""")
+_USER_CONTEXT_SQL = text("""
+    SELECT u.email,
+           (SELECT s.tier
+            FROM subscriptions s
+            WHERE s.user_id = u.id
+            AND s.status = 'active'
+            LIMIT 1) AS tier
+    FROM ab_user u
+    WHERE u.id = :user_id
+""")
+
 
 def get_posthog_distinct_id(user_id: int, email: Optional[str] = None) -> str:
     """
@@ -57,6 +92,25 @@ def get_posthog_distinct_id(user_id: int, email: Optional[str] = None) -> str:
     return email if email else str(user_id)
 
 
+def request_distinct_id(user_id: Optional[int]) -> Optional[str]:
+    """
+    Get the distinct_id precomputed for the current request's user.
+
+    The RLS middleware stores it in g at the start of each authenticated request.
+
+    Args:
+        user_id: User ID the event is for
+
+    Returns:
+        distinct_id string if user_id is the request's authenticated user, else None
+    """
+    if not user_id or not has_request_context():
+        return None
+    if g.get('current_user_id') != user_id:
+        return None
+    return g.get('posthog_distinct_id')
+
+
 def _get_user_email(user_id: int) -> Optional[str]:
     """
     Get the email for a user.
@@ -67,26 +121,84 @@ def _get_user_email(user_id: int) -> Optional[str]:
     Returns:
         User email or None
     """
+    with _user_cache_lock:
+        email = _user_email_cache.get(user_id)
+    if email is not None:
+        return email
+
     try:
         from app.database import SessionLocal
-        from sqlalchemy import text
 
         db = SessionLocal()
         try:
-            result = db.execute(text("""
-                SELECT email
-                FROM ab_user
-                WHERE id = :user_id
-            """), {'user_id': user_id}).fetchone()
+            result = db.execute(_USER_EMAIL_SQL, {'user_id': user_id}).fetchone()
 
-            return result[0] if result else None
+            email = result[0] if result else None
         finally:
             db.close()
+
+        if email is not None:
+            with _user_cache_lock:
+                _user_email_cache[user_id] = email
+        return email
     except Exception as e:
         logger.error(f"Failed to get email for user {user_id}: {str(e)}")
         return None
 
 
+def _get_user_context(user_id: int) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Get the email and active subscription tier for a user in a single query.
+
+    Args:
+        user_id: User ID
+
+    Returns:
+        (email, tier) tuple; either may be None
+    """
+    with _user_cache_lock:
+        email = _user_email_cache.get(user_id)
+        tier = _user_tier_cache.get(user_id)
+    if email is not None and tier is not None:
+        return email, tier
+
+    try:
+        from app.database import SessionLocal
+
+        db = SessionLocal()
+        try:
+            result = db.execute(_USER_CONTEXT_SQL, {'user_id': user_id}).fetchone()
+
+            email, tier = (result[0], result[1]) if result else (None, None)
+        finally:
+            db.close()
+
+        with _user_cache_lock:
+            if email is not None:
+                _user_email_cache[user_id] = email
+            if tier is not None:
+                _user_tier_cache[user_id] = tier
+        return email, tier
+    except Exception as e:
+        logger.error(f"Failed to get email and subscription tier for user {user_id}: {str(e)}")
+        return None, None
+
+
+def forget_user(user_id: int) -> None:
+    """
+    Drop a user's cached email and tier, e.g. after an email or tier change.
+
+    Only clears this process's cache; other workers pick the change up when their
+    entries expire. Also drops the distinct_id stashed on g if it's this user's.
+    """
+    with _user_cache_lock:
+        _user_email_cache.pop(user_id, None)
+        _user_tier_cache.pop(user_id, None)
+
+    if has_request_context() and g.get('current_user_id') == user_id:
+        g.pop('posthog_distinct_id', None)
+
+
 def track_event(
     user_id: Optional[int],
     event_name: str,
@@ -107,24 +219,26 @@ def track_event(
     if not posthog_client:
         return
 
-    # Auto-compute distinct_id from user_id if not provided
+    if distinct_id is None and not user_id:
+        # No user_id and no distinct_id - skip tracking
+        # PostHog has built-in anonymous handling; we should never use hardcoded "anonymous"
+        logger.warning(f"Event '{event_name}' has no user_id or distinct_id - skipping. If this is an authenticated endpoint, this is a bug.")
+        return
+
+    # Email and tier come from one lookup (one query on a cache miss)
+    email, tier = _get_user_context(user_id) if user_id else (None, None)
+
+    # Auto-compute distinct_id from user_id if not provided.
+    # Pass '' rather than None when the email is unknown so it isn't looked up again.
     if distinct_id is None:
-        if user_id:
-            distinct_id = get_posthog_distinct_id(user_id)
-        else:
-            # No user_id and no distinct_id - skip tracking
-            # PostHog has built-in anonymous handling; we should never use hardcoded "anonymous"
-            logger.warning(f"Event '{event_name}' has no user_id or distinct_id - skipping. If this is an authenticated endpoint, this is a bug.")
-            return
+        distinct_id = request_distinct_id(user_id) or get_posthog_distinct_id(user_id, email or '')
 
     # Initialize properties dict
     props = properties or {}
 
     # Auto-enrich with subscription tier if user_id provided
-    if user_id:
-        tier = _get_user_subscription_tier(user_id)
-        if tier:
-            props['subscription_tier'] = tier
+    if tier:
+        props['subscription_tier'] = tier
 
     # Always include user_id for filtering
     if user_id:
@@ -167,37 +281,6 @@ def identify_user(user_id: int, properties: Optional[Dict[str, Any]] = None, dis
         logger.error(f"Failed to identify user {distinct_id}: {str(e)}")
 
 
-def _get_user_subscription_tier(user_id: int) -> Optional[str]:
-    """
-    Get the current subscription tier for a user.
-
-    Args:
-        user_id: User ID
-
-    Returns:
-        Subscription tier string or None
-    """
-    try:
-        from app.database import SessionLocal
-        from sqlalchemy import text
-
-        db = SessionLocal()
-        try:
-            result = db.execute(text("""
-                SELECT s.tier
-                FROM subscriptions s
-                WHERE s.user_id = :user_id
-                AND s.status = 'active'
-            """), {'user_id': user_id}).fetchone()
-
-            return result[0] if result else None
-        finally:
-            db.close()
-    except Exception as e:
-        logger.error(f"Failed to get subscription tier for user {user_id}: {str(e)}")
-        return None
-
-
 def create_instrumented_anthropic_client(api_key: str, user_id: Optional[int] = None):
     """
     Create an Anthropic client with PostHog LLM auto-instrumentation.
@@ -7,24 +7,44 @@ Implements tier-based rate limits:
 - themost: 100/day, 40/hour
 - complimentary: unlimited daily, 40/hour burst limit
 - byoClaude (users with own API key): unlimited
+
+Call counters live in Redis (see rate_limits_redis.py); windows reset at midnight UTC
+and at the top of each hour.
 """
 
 from datetime import datetime, timezone, timedelta
+from types import MappingProxyType
 from typing import Tuple, Optional
 import logging
 
+import redis
+
+from app.utils import rate_limits_redis
+
 logger = logging.getLogger(__name__)
 
 # Rate limits by tier: (daily_limit, hourly_limit)
-# None means unlimited
-AUTOCREATE_RATE_LIMITS = {
+# None means unlimited. Read-only, like SUBSCRIPTION_TIERS.
+AUTOCREATE_RATE_LIMITS = MappingProxyType({
     'free': (0, 0),  # No access without byoClaude key
     'basic': (0, 0),  # No access without byoClaude key
     'thegoods': (25, 10),
     'moregoods': (50, 20),
     'themost': (100, 40),
     'complimentary': (None, 40),  # Unlimited daily, 40/hour burst
-}
+})
+
+_NO_ACCESS_LIMITS = (0, 0)
+_COMPLIMENTARY_LIMITS = AUTOCREATE_RATE_LIMITS['complimentary']
+
+
+def _next_boundaries(now: datetime) -> Tuple[datetime, datetime]:
+    """Next midnight UTC and next top of the hour after now (when the windows reset)."""
+    tomorrow = now.date() + timedelta(days=1)
+    return (
+        datetime(tomorrow.year, tomorrow.month, tomorrow.day, tzinfo=timezone.utc),
+        (now + timedelta(hours=1)).replace(minute=0, second=0, microsecond=0),
+    )
 
 
 def get_tier_rate_limits(tier: str, is_complimentary: bool = False) -> Tuple[Optional[int], Optional[int]]:
@@ -39,9 +59,41 @@ def get_tier_rate_limits(tier: str, is_complimentary: bool = False) -> Tuple[Opt
         Tuple of (daily_limit, hourly_limit). None means unlimited.
     """
     if is_complimentary:
-        return AUTOCREATE_RATE_LIMITS['complimentary']
+        return _COMPLIMENTARY_LIMITS
 
-    return AUTOCREATE_RATE_LIMITS.get(tier, (0, 0))
+    return AUTOCREATE_RATE_LIMITS.get(tier, _NO_ACCESS_LIMITS)
+
+
+def _rate_limit_result(
+    tier: str,
+    is_complimentary: bool,
+    daily_limit: Optional[int],
+    hourly_limit: Optional[int],
+    calls_today: int,
+    calls_this_hour: int,
+    daily_reset_at: datetime,
+    hourly_reset_at: datetime,
+    over_limit: bool
+) -> Tuple[bool, str, int, int, Optional[str], Optional[str]]:
+    """Build the check result tuple from the current counts."""
+    remaining_daily = (daily_limit - calls_today) if daily_limit is not None else -1
+    remaining_hourly = (hourly_limit - calls_this_hour) if hourly_limit is not None else -1
+    daily_reset_str = daily_reset_at.isoformat()
+    hourly_reset_str = hourly_reset_at.isoformat()
+
+    if not over_limit:
+        return (True, "OK", remaining_daily, remaining_hourly, daily_reset_str, hourly_reset_str)
+
+    tier_display = "complimentary" if is_complimentary else tier
+
+    # Check daily limit (if not unlimited)
+    if daily_limit is not None and calls_today >= daily_limit:
+        reason = f"You've reached your daily autocreate limit ({daily_limit}/day for {tier_display} tier). Resets at midnight UTC."
+    # Otherwise it's the hourly limit (burst protection)
+    else:
+        reason = f"You've reached your hourly autocreate limit ({hourly_limit}/hour for {tier_display} tier). Resets at the top of the hour."
+
+    return (False, reason, remaining_daily, remaining_hourly, daily_reset_str, hourly_reset_str)
 
 
 def check_autocreate_rate_limit(
@@ -84,186 +136,91 @@ def check_autocreate_rate_limit(
             0, 0, None, None
         )
 
-    # Get current usage from database
-    from app.database import SessionLocal
-    from sqlalchemy import text
+    daily_reset_at, hourly_reset_at = _next_boundaries(datetime.now(timezone.utc))
 
-    db = SessionLocal()
     try:
-        result = db.execute(text("""
-            SELECT
-                autocreate_calls_today,
-                autocreate_calls_this_hour,
-                autocreate_daily_reset_at,
-                autocreate_hourly_reset_at
-            FROM subscriptions
-            WHERE user_id = :user_id
-            AND status = 'active'
-        """), {'user_id': user_id}).fetchone()
-
-        if not result:
-            return (
-                False,
-                "No active subscription found.",
-                0, 0, None, None
-            )
-
-        calls_today = result[0] or 0
-        calls_this_hour = result[1] or 0
-        daily_reset_at = result[2]
-        hourly_reset_at = result[3]
-
-        now = datetime.now(timezone.utc)
-
-        # Check and reset daily counter if needed
-        if daily_reset_at is None or now >= daily_reset_at:
-            calls_today = 0
-            # Calculate next midnight UTC
-            tomorrow = now.date() + timedelta(days=1)
-            daily_reset_at = datetime(
-                tomorrow.year, tomorrow.month, tomorrow.day,
-                0, 0, 0, tzinfo=timezone.utc
-            )
-            # Update in database
-            db.execute(text("""
-                UPDATE subscriptions
-                SET autocreate_calls_today = 0,
-                    autocreate_daily_reset_at = :reset_at
-                WHERE user_id = :user_id
-            """), {'user_id': user_id, 'reset_at': daily_reset_at})
-            db.commit()
-            logger.info(f"[RATE LIMIT] Reset daily counter for user {user_id}")
-
-        # Check and reset hourly counter if needed
-        if hourly_reset_at is None or now >= hourly_reset_at:
-            calls_this_hour = 0
-            # Calculate next hour boundary
-            hourly_reset_at = (now + timedelta(hours=1)).replace(
-                minute=0, second=0, microsecond=0
-            )
-            # Update in database
-            db.execute(text("""
-                UPDATE subscriptions
-                SET autocreate_calls_this_hour = 0,
-                    autocreate_hourly_reset_at = :reset_at
-                WHERE user_id = :user_id
-            """), {'user_id': user_id, 'reset_at': hourly_reset_at})
-            db.commit()
-            logger.info(f"[RATE LIMIT] Reset hourly counter for user {user_id}")
-
-        # Calculate remaining
-        remaining_daily = (daily_limit - calls_today) if daily_limit is not None else -1
-        remaining_hourly = (hourly_limit - calls_this_hour) if hourly_limit is not None else -1
-
-        # Format reset times
-        daily_reset_str = daily_reset_at.isoformat() if daily_reset_at else None
-        hourly_reset_str = hourly_reset_at.isoformat() if hourly_reset_at else None
-
-        # Check daily limit (if not unlimited)
-        if daily_limit is not None and calls_today >= daily_limit:
-            tier_display = "complimentary" if is_complimentary else tier
-            return (
-                False,
-                f"You've reached your daily autocreate limit ({daily_limit}/day for {tier_display} tier). Resets at midnight UTC.",
-                remaining_daily,
-                remaining_hourly,
-                daily_reset_str,
-                hourly_reset_str
-            )
-
-        # Check hourly limit (burst protection)
-        if hourly_limit is not None and calls_this_hour >= hourly_limit:
-            tier_display = "complimentary" if is_complimentary else tier
-            return (
-                False,
-                f"You've reached your hourly autocreate limit ({hourly_limit}/hour for {tier_display} tier). Resets at the top of the hour.",
-                remaining_daily,
-                remaining_hourly,
-                daily_reset_str,
-                hourly_reset_str
-            )
-
-        logger.info(f"[RATE LIMIT] User {user_id} allowed: {remaining_daily} daily, {remaining_hourly} hourly remaining")
-        return (True, "OK", remaining_daily, remaining_hourly, daily_reset_str, hourly_reset_str)
-
-    except Exception as e:
+        calls_today, calls_this_hour = rate_limits_redis.usage(user_id, daily_reset_at, hourly_reset_at)
+    except redis.RedisError as e:
         logger.error(f"[RATE LIMIT] Error checking rate limit for user {user_id}: {e}")
         # On error, allow the call but log the issue
         return (True, "OK (rate limit check failed)", -1, -1, None, None)
-    finally:
-        db.close()
+
+    over_limit = (
+        (daily_limit is not None and calls_today >= daily_limit)
+        or (hourly_limit is not None and calls_this_hour >= hourly_limit)
+    )
+    return _rate_limit_result(
+        tier, is_complimentary, daily_limit, hourly_limit,
+        calls_today, calls_this_hour, daily_reset_at, hourly_reset_at, over_limit
+    )
 
 
-def increment_autocreate_usage(user_id: int) -> bool:
+def reserve_autocreate_call(
+    user_id: int,
+    tier: str,
+    is_complimentary: bool = False,
+    is_using_own_key: bool = False
+) -> Tuple[bool, str, int, int, Optional[str], Optional[str], bool]:
     """
-    Increment autocreate usage counters after a successful API call.
+    Check the rate limits and, if allowed, count the autocreate call (one Redis call).
+
+    Call this before the API call and, if reserved is True, release_autocreate_call()
+    if it then fails, so only successful calls stay counted.
 
     Args:
         user_id: User's ID
+        tier: User's subscription tier
+        is_complimentary: Whether this is a complimentary account
+        is_using_own_key: Whether the user is using their own API key (byoClaude)
 
     Returns:
-        True if update succeeded, False otherwise
+        Same tuple as check_autocreate_rate_limit() (remaining counts include this call),
+        plus reserved: bool - whether a call was actually counted. False when nothing
+        was counted: byoClaude, no access, over the limit, or Redis unreachable
     """
-    from app.database import SessionLocal
-    from sqlalchemy import text
+    daily_limit, hourly_limit = get_tier_rate_limits(tier, is_complimentary)
+
+    # byoClaude users and tiers without access have nothing to count
+    if is_using_own_key or (daily_limit == 0 and hourly_limit == 0):
+        return check_autocreate_rate_limit(user_id, tier, is_complimentary, is_using_own_key) + (False,)
+
+    daily_reset_at, hourly_reset_at = _next_boundaries(datetime.now(timezone.utc))
 
-    db = SessionLocal()
     try:
-        now = datetime.now(timezone.utc)
-
-        # Get current reset times to ensure counters are initialized
-        result = db.execute(text("""
-            SELECT autocreate_daily_reset_at, autocreate_hourly_reset_at
-            FROM subscriptions
-            WHERE user_id = :user_id
-        """), {'user_id': user_id}).fetchone()
-
-        if not result:
-            logger.error(f"[RATE LIMIT] No subscription found for user {user_id}")
-            return False
-
-        daily_reset_at = result[0]
-        hourly_reset_at = result[1]
-
-        # Initialize reset times if not set
-        update_fields = ["autocreate_calls_today = autocreate_calls_today + 1",
-                         "autocreate_calls_this_hour = autocreate_calls_this_hour + 1"]
-        params = {'user_id': user_id}
-
-        if daily_reset_at is None:
-            tomorrow = now.date() + timedelta(days=1)
-            daily_reset_at = datetime(
-                tomorrow.year, tomorrow.month, tomorrow.day,
-                0, 0, 0, tzinfo=timezone.utc
-            )
-            update_fields.append("autocreate_daily_reset_at = :daily_reset")
-            params['daily_reset'] = daily_reset_at
-
-        if hourly_reset_at is None:
-            hourly_reset_at = (now + timedelta(hours=1)).replace(
-                minute=0, second=0, microsecond=0
-            )
-            update_fields.append("autocreate_hourly_reset_at = :hourly_reset")
-            params['hourly_reset'] = hourly_reset_at
-
-        query = f"""
-            UPDATE subscriptions
-            SET {', '.join(update_fields)}
-            WHERE user_id = :user_id
-        """
-
-        db.execute(text(query), params)
-        db.commit()
-
-        logger.info(f"[RATE LIMIT] Incremented usage counters for user {user_id}")
-        return True
+        allowed, calls_today, calls_this_hour = rate_limits_redis.reserve(
+            user_id, daily_limit, hourly_limit, daily_reset_at, hourly_reset_at
+        )
+    except redis.RedisError as e:
+        logger.error(f"[RATE LIMIT] Error reserving autocreate call for user {user_id}: {e}")
+        # On error, allow the call but log the issue; nothing was counted
+        return (True, "OK (rate limit check failed)", -1, -1, None, None, False)
+
+    result = _rate_limit_result(
+        tier, is_complimentary, daily_limit, hourly_limit,
+        calls_today, calls_this_hour, daily_reset_at, hourly_reset_at, not allowed
+    )
+    if allowed:
+        logger.info(f"[RATE LIMIT] User {user_id} allowed: {result[2]} daily, {result[3]} hourly remaining")
+    return result + (allowed,)
+
 
-    except Exception as e:
-        logger.error(f"[RATE LIMIT] Error incrementing usage for user {user_id}: {e}")
-        db.rollback()
+def release_autocreate_call(user_id: int) -> bool:
+    """
+    Give back a call counted by reserve_autocreate_call() after the API call failed.
+
+    Args:
+        user_id: User's ID
+
+    Returns:
+        True if update succeeded, False otherwise
+    """
+    try:
+        rate_limits_redis.release(user_id, *_next_boundaries(datetime.now(timezone.utc)))
+        logger.info(f"[RATE LIMIT] Released reserved autocreate call for user {user_id}")
+        return True
+    except redis.RedisError as e:
+        logger.error(f"[RATE LIMIT] Error releasing autocreate call for user {user_id}: {e}")
         return False
-    finally:
-        db.close()
 
 
 def get_autocreate_usage_info(user_id: int, tier: str, is_complimentary: bool = False) -> dict:
@@ -279,50 +236,32 @@ def get_autocreate_usage_info(user_id: int, tier: str, is_complimentary: bool =
         Dictionary with usage information
     """
     daily_limit, hourly_limit = get_tier_rate_limits(tier, is_complimentary)
+    no_usage = {
+        'daily_used': 0,
+        'daily_limit': daily_limit,
+        'hourly_used': 0,
+        'hourly_limit': hourly_limit,
+        'daily_resets_at': None,
+        'hourly_resets_at': None,
+    }
+
+    # Tiers without access never count calls, so there's nothing to look up
+    if daily_limit == 0 and hourly_limit == 0:
+        return no_usage
 
-    from app.database import SessionLocal
-    from sqlalchemy import text
+    daily_reset_at, hourly_reset_at = _next_boundaries(datetime.now(timezone.utc))
 
-    db = SessionLocal()
     try:
-        result = db.execute(text("""
-            SELECT
-                autocreate_calls_today,
-                autocreate_calls_this_hour,
-                autocreate_daily_reset_at,
-                autocreate_hourly_reset_at
-            FROM subscriptions
-            WHERE user_id = :user_id
-        """), {'user_id': user_id}).fetchone()
-
-        if not result:
-            return {
-                'daily_used': 0,
-                'daily_limit': daily_limit,
-                'hourly_used': 0,
-                'hourly_limit': hourly_limit,
-                'daily_resets_at': None,
-                'hourly_resets_at': None,
-            }
-
-        return {
-            'daily_used': result[0] or 0,
-            'daily_limit': daily_limit,
-            'hourly_used': result[1] or 0,
-            'hourly_limit': hourly_limit,
-            'daily_resets_at': result[2].isoformat() if result[2] else None,
-            'hourly_resets_at': result[3].isoformat() if result[3] else None,
-        }
-
-    except Exception as e:
+        calls_today, calls_this_hour = rate_limits_redis.usage(user_id, daily_reset_at, hourly_reset_at)
+    except redis.RedisError as e:
         logger.error(f"[RATE LIMIT] Error getting usage info for user {user_id}: {e}")
-        return {
-            'daily_used': 0,
-            'daily_limit': daily_limit,
-            'hourly_used': 0,
-            'hourly_limit': hourly_limit,
-            'daily_resets_at': None,
-            'hourly_resets_at': None,
-        }
-    finally:
-        db.close()
+        return no_usage
+
+    return {
+        'daily_used': calls_today,
+        'daily_limit': daily_limit,
+        'hourly_used': calls_this_hour,
+        'hourly_limit': hourly_limit,
+        'daily_resets_at': daily_reset_at.isoformat(),
+        'hourly_resets_at': hourly_reset_at.isoformat(),
+    }
@@ -0,0 +1,113 @@
+"""
+Redis storage for autocreate rate-limit counters.
+
+Each user has one counter per window (day and hour). A window's key carries its reset
+time, so a new window starts from an empty key; EXPIREAT removes old keys at their
+reset. Reserving checks both limits and counts the call inside one Lua script, so
+concurrent requests at the limit can't both get through.
+"""
+
+import os
+from datetime import datetime
+from typing import Optional, Tuple
+
+import redis
+
+_redis = redis.from_url(os.getenv('REDIS_URL', 'redis://localhost:6379/0'))
+
+# KEYS: daily key, hourly key
+# ARGV: daily limit, hourly limit (-1 = unlimited), daily reset, hourly reset (unix seconds)
+# Returns {allowed (1/0), calls today, calls this hour}; counts include this call if allowed
+_RESERVE_SCRIPT = _redis.register_script("""
+local today = tonumber(redis.call('GET', KEYS[1]) or '0')
+local this_hour = tonumber(redis.call('GET', KEYS[2]) or '0')
+local daily_limit = tonumber(ARGV[1])
+local hourly_limit = tonumber(ARGV[2])
+
+if (daily_limit >= 0 and today >= daily_limit) or (hourly_limit >= 0 and this_hour >= hourly_limit) then
+    return {0, today, this_hour}
+end
+
+today = redis.call('INCR', KEYS[1])
+redis.call('EXPIREAT', KEYS[1], ARGV[3])
+this_hour = redis.call('INCR', KEYS[2])
+redis.call('EXPIREAT', KEYS[2], ARGV[4])
+return {1, today, this_hour}
+""")
+
+# KEYS: daily key, hourly key. Gives back one call in whichever windows still hold it.
+_RELEASE_SCRIPT = _redis.register_script("""
+for _, key in ipairs(KEYS) do
+    if tonumber(redis.call('GET', key) or '0') > 0 then
+        redis.call('DECR', key)
+    end
+end
+return 1
+""")
+
+
+def _keys(user_id: int, daily_reset_at: datetime, hourly_reset_at: datetime) -> list:
+    """Counter keys for the windows ending at the given reset times."""
+    return [
+        f"autocreate:day:{user_id}:{int(daily_reset_at.timestamp())}",
+        f"autocreate:hour:{user_id}:{int(hourly_reset_at.timestamp())}",
+    ]
+
+
+def reserve(
+    user_id: int,
+    daily_limit: Optional[int],
+    hourly_limit: Optional[int],
+    daily_reset_at: datetime,
+    hourly_reset_at: datetime
+) -> Tuple[bool, int, int]:
+    """
+    Count one call if the user is under both limits.
+
+    Args:
+        user_id: User's ID
+        daily_limit: Daily limit, None for unlimited
+        hourly_limit: Hourly limit, None for unlimited
+        daily_reset_at: End of the current daily window
+        hourly_reset_at: End of the current hourly window
+
+    Returns:
+        Tuple of (allowed, calls_today, calls_this_hour)
+
+    Raises:
+        redis.RedisError: If Redis is unreachable
+    """
+    allowed, calls_today, calls_this_hour = _RESERVE_SCRIPT(
+        keys=_keys(user_id, daily_reset_at, hourly_reset_at),
+        args=[
+            -1 if daily_limit is None else daily_limit,
+            -1 if hourly_limit is None else hourly_limit,
+            int(daily_reset_at.timestamp()),
+            int(hourly_reset_at.timestamp()),
+        ],
+    )
+    return bool(allowed), calls_today, calls_this_hour
+
+
+def release(user_id: int, daily_reset_at: datetime, hourly_reset_at: datetime) -> None:
+    """
+    Give back one reserved call in the current windows.
+
+    Raises:
+        redis.RedisError: If Redis is unreachable
+    """
+    _RELEASE_SCRIPT(keys=_keys(user_id, daily_reset_at, hourly_reset_at))
+
+
+def usage(user_id: int, daily_reset_at: datetime, hourly_reset_at: datetime) -> Tuple[int, int]:
+    """
+    Read the user's call counts for the current windows.
+
+    Returns:
+        Tuple of (calls_today, calls_this_hour)
+
+    Raises:
+        redis.RedisError: If Redis is unreachable
+    """
+    calls_today, calls_this_hour = _redis.mget(_keys(user_id, daily_reset_at, hourly_reset_at))
+    return int(calls_today or 0), int(calls_this_hour or 0)
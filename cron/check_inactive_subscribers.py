@@ -15,7 +15,8 @@ Example crontab entry (runs daily at 10 AM):
 
 import os
 import sys
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 from pathlib import Path
 
 # Add parent directory to path to import app modules
@@ -26,9 +27,9 @@ from dotenv import load_dotenv
 load_dotenv(Path(__file__).parent.parent / '.env')
 
 from app.database import SessionLocal
-from app.utils.email_templates import inactivity_notification_email
+from app.utils.email_templates import inactivity_notification_batch, MAILGUN_BATCH_SIZE
 from sqlalchemy import text
-from itsdangerous import URLSafeTimedSerializer
+from app.unsubscribe_tokens import get_serializer
 import stripe
 import logging
 
@@ -47,6 +48,10 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+# Concurrent Stripe requests during the monthly period_end refresh (each one is mostly
+# network wait)
+STRIPE_FETCH_WORKERS = 16
+
 
 def generate_unsubscribe_token(user_id: int) -> str:
     """
@@ -59,7 +64,7 @@ def generate_unsubscribe_token(user_id: int) -> str:
     if not secret_key:
         raise ValueError("SECRET_KEY environment variable not set")
 
-    serializer = URLSafeTimedSerializer(secret_key)
+    serializer = get_serializer(secret_key)
     payload = {
         'user_id': user_id,
         'type': 'inactivity_unsubscribe'
@@ -81,10 +86,6 @@ def check_inactive_subscribers():
 
     db = SessionLocal()
     try:
-        now = datetime.utcnow()
-        ninety_days_ago = now - timedelta(days=90)
-        two_days_from_now = now + timedelta(days=2)
-
         # Find inactive paying subscribers who need notification
         # Conditions:
         # - Paying tier (not free)
@@ -92,6 +93,8 @@ def check_inactive_subscribers():
         # - Last activity more than 90 days ago (or never recorded)
         # - Not opted out of inactivity emails
         # - Either: never sent an email, OR current_period_end is within 2 days
+        # Rows stream from a server-side cursor; the cursor is fully read before the
+        # first batch commits below (a commit would close it)
         result = db.execute(text("""
             SELECT
                 s.user_id,
@@ -105,27 +108,24 @@ def check_inactive_subscribers():
             JOIN ab_user u ON s.user_id = u.id
             WHERE s.tier != 'free'
                 AND s.status = 'active'
-                AND COALESCE(s.complimentary_account, FALSE) = FALSE
+                AND s.is_complimentary = FALSE
                 AND COALESCE(s.inactivity_emails_opted_out, FALSE) = FALSE
-                AND (s.last_activity IS NULL OR s.last_activity < :ninety_days_ago)
+                AND (s.last_activity IS NULL OR s.last_activity < NOW() - INTERVAL '90 days')
                 AND (
                     s.last_inactivity_email_sent IS NULL
                     OR (
                         s.current_period_end IS NOT NULL
-                        AND s.current_period_end <= :two_days_from_now
-                        AND s.current_period_end > :now
+                        AND s.current_period_end <= NOW() + INTERVAL '2 days'
+                        AND s.current_period_end > NOW()
                     )
                 )
-        """), {
-            'ninety_days_ago': ninety_days_ago,
-            'two_days_from_now': two_days_from_now,
-            'now': now
-        })
+        """).execution_options(stream_results=True, yield_per=100))
 
-        inactive_subscribers = result.fetchall()
-        logger.info(f"Found {len(inactive_subscribers)} inactive subscribers to notify")
-
-        for subscriber in inactive_subscribers:
+        # Collect recipients, then send them in Mailgun batches (one API call per batch)
+        recipients = []
+        subscriber_count = 0
+        for subscriber in result:
+            subscriber_count += 1
             user_id, tier, period_end, last_activity, last_email_sent, email, username = subscriber
 
             # Skip placeholder Tidal emails (they won't receive emails anyway)
@@ -137,31 +137,37 @@ def check_inactive_subscribers():
 
             try:
                 # Generate unsubscribe token
-                unsubscribe_token = generate_unsubscribe_token(user_id)
+                recipients.append((user_id, email, username, generate_unsubscribe_token(user_id)))
+            except Exception as e:
+                logger.error(f"Error processing user {user_id}: {e}")
+                # Continue to next subscriber
+
+        logger.info(f"Found {subscriber_count} inactive subscribers to notify")
 
-                # Send notification email
-                success = inactivity_notification_email(
-                    to_email=email,
-                    username=username,
-                    unsubscribe_token=unsubscribe_token
+        for start in range(0, len(recipients), MAILGUN_BATCH_SIZE):
+            batch = recipients[start:start + MAILGUN_BATCH_SIZE]
+            try:
+                # Send notification emails
+                success = inactivity_notification_batch(
+                    (email, username, token) for _, email, username, token in batch
                 )
 
                 if success:
-                    # Update tracking field
+                    # Update tracking field for the whole batch
                     db.execute(text("""
                         UPDATE subscriptions
-                        SET last_inactivity_email_sent = :now
-                        WHERE user_id = :user_id
-                    """), {'now': now, 'user_id': user_id})
+                        SET last_inactivity_email_sent = NOW()
+                        WHERE user_id = ANY(:user_ids)
+                    """), {'user_ids': [user_id for user_id, _, _, _ in batch]})
                     db.commit()
-                    logger.info(f"Sent inactivity email to {email}")
+                    logger.info(f"Sent inactivity email to {len(batch)} subscribers")
                 else:
-                    logger.error(f"Failed to send inactivity email to {email}")
+                    logger.error(f"Failed to send inactivity email to {len(batch)} subscribers")
 
             except Exception as e:
-                logger.error(f"Error processing user {user_id}: {e}")
+                logger.error(f"Error sending inactivity batch of {len(batch)}: {e}")
                 db.rollback()
-                # Continue to next subscriber
+                # Continue to next batch
 
         logger.info("Inactive subscriber check complete")
 
@@ -172,6 +178,24 @@ def check_inactive_subscribers():
         db.close()
 
 
+def fetch_stripe_period_end(user_id: int, stripe_sub_id: str):
+    """
+    Fetch a subscription's current_period_end from Stripe.
+
+    Returns:
+        (user_id, period_end) tuple, with period_end None if it couldn't be fetched
+    """
+    try:
+        stripe_sub = stripe.Subscription.retrieve(stripe_sub_id)
+        return user_id, datetime.fromtimestamp(stripe_sub.current_period_end, timezone.utc)
+    except stripe.error.InvalidRequestError as e:
+        # Subscription might be canceled/deleted in Stripe
+        logger.warning(f"Could not fetch Stripe subscription {stripe_sub_id} for user {user_id}: {e}")
+    except Exception as e:
+        logger.error(f"Error refreshing period_end for user {user_id}: {e}")
+    return user_id, None
+
+
 def refresh_stripe_period_end():
     """
     Once per month, refresh current_period_end from Stripe for all paying subscribers.
@@ -180,7 +204,7 @@ def refresh_stripe_period_end():
     Only runs on the 1st of each month.
     """
     # Only run on the 1st of the month
-    if datetime.utcnow().day != 1:
+    if datetime.now(timezone.utc).day != 1:
         logger.info("Skipping Stripe period refresh (not the 1st of the month)")
         return
 
@@ -194,45 +218,40 @@ def refresh_stripe_period_end():
 
     db = SessionLocal()
     try:
-        # Find all paying subscribers with a Stripe subscription ID
+        # Find all paying subscribers with a Stripe subscription ID (streamed from a
+        # server-side cursor straight into the Stripe fetches)
         result = db.execute(text("""
             SELECT user_id, stripe_subscription_id
             FROM subscriptions
             WHERE tier != 'free'
                 AND status = 'active'
                 AND stripe_subscription_id IS NOT NULL
-        """))
-
-        subscribers = result.fetchall()
-        logger.info(f"Refreshing period_end for {len(subscribers)} paying subscribers")
-
-        updated_count = 0
-        for user_id, stripe_sub_id in subscribers:
-            try:
-                # Fetch subscription from Stripe
-                stripe_sub = stripe.Subscription.retrieve(stripe_sub_id)
-
-                # Update local database with Stripe's current_period_end
-                # Also update stripe_period_end for backward compatibility
-                period_end = datetime.utcfromtimestamp(stripe_sub.current_period_end)
-
-                db.execute(text("""
-                    UPDATE subscriptions
-                    SET current_period_end = :period_end,
-                        stripe_period_end = :period_end
-                    WHERE user_id = :user_id
-                """), {'period_end': period_end, 'user_id': user_id})
-
-                updated_count += 1
-
-            except stripe.error.InvalidRequestError as e:
-                # Subscription might be canceled/deleted in Stripe
-                logger.warning(f"Could not fetch Stripe subscription {stripe_sub_id} for user {user_id}: {e}")
-            except Exception as e:
-                logger.error(f"Error refreshing period_end for user {user_id}: {e}")
+        """).execution_options(stream_results=True, yield_per=100))
+
+        # Fetch from Stripe concurrently, then apply every result in one UPDATE
+        with ThreadPoolExecutor(max_workers=STRIPE_FETCH_WORKERS) as executor:
+            results = list(executor.map(lambda sub: fetch_stripe_period_end(*sub), result))
+        logger.info(f"Fetched period_end for {len(results)} paying subscribers")
+
+        refreshed = [(user_id, period_end) for user_id, period_end in results if period_end is not None]
+
+        if refreshed:
+            # Update local database with Stripe's current_period_end
+            # Also update stripe_period_end for backward compatibility
+            db.execute(text("""
+                UPDATE subscriptions AS s
+                SET current_period_end = v.period_end,
+                    stripe_period_end = v.period_end
+                FROM unnest(CAST(:user_ids AS integer[]), CAST(:period_ends AS timestamptz[]))
+                    AS v(user_id, period_end)
+                WHERE s.user_id = v.user_id
+            """), {
+                'user_ids': [user_id for user_id, _ in refreshed],
+                'period_ends': [period_end for _, period_end in refreshed],
+            })
 
         db.commit()
-        logger.info(f"Refreshed period_end for {updated_count} subscribers")
+        logger.info(f"Refreshed period_end for {len(refreshed)} subscribers")
 
     except Exception as e:
         logger.error(f"Error in Stripe period refresh: {e}")
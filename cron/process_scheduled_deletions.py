@@ -11,6 +11,7 @@ Example crontab entry (runs daily at 2 AM):
 
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
 
@@ -19,7 +20,7 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from app.database import SessionLocal
 from app.utils.email_templates import final_deletion_scheduled_email
-from app.utils.account_deletion import delete_user_account
+from app.utils.account_deletion import delete_user_account, schedule_posthog_person_deletion
 from sqlalchemy import text
 import stripe
 import logging
@@ -36,6 +37,92 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+# Concurrent Stripe refunds (each is a charge lookup plus a refund request)
+STRIPE_REFUND_WORKERS = 8
+
+# Account deletions committed together (each one runs in its own savepoint)
+DELETION_COMMIT_BATCH = 25
+
+
+def process_refund(user_id, deletion_date, stripe_customer_id, refund_amount):
+    """
+    Refund a user's most recent Stripe charge.
+
+    Errors are logged, not raised: the deletion goes ahead even if the refund fails.
+    The idempotency key only covers a retry within Stripe's ~24h key window; the
+    caller records each refund in the database so later runs don't repeat it.
+
+    Returns:
+        True if a refund was created, False otherwise
+    """
+    logger.info(f"Processing refund of ${refund_amount} for user {user_id}")
+    try:
+        # Create refund for the customer
+        # Note: This creates a refund for the most recent charge
+        charges = stripe.Charge.list(customer=stripe_customer_id, limit=1)
+        if charges.data:
+            latest_charge = charges.data[0]
+            refund = stripe.Refund.create(
+                charge=latest_charge.id,
+                amount=int(refund_amount * 100),  # Convert dollars to cents
+                reason='requested_by_customer',
+                idempotency_key=f"scheduled-deletion-refund-{user_id}-{deletion_date:%Y%m%d}"
+            )
+            logger.info(f"Refund created: {refund.id}")
+            return True
+    except Exception as e:
+        logger.error(f"Error processing refund for user {user_id}: {e}")
+    return False
+
+
+def record_refund(db, user_id):
+    """
+    Zero a user's pending prorated refund once it has been issued, and commit.
+
+    Committed per refund, before any deletion runs, so if a deletion fails or the
+    run crashes the user stays scheduled without being refunded a second time.
+    """
+    db.execute(text("""
+        UPDATE subscriptions
+        SET prorated_refund_amount = 0
+        WHERE user_id = :user_id
+    """), {'user_id': user_id})
+    db.commit()
+
+
+def finish_deletions(db, deleted):
+    """
+    Commit a batch of account deletions, then do the follow-up for each account.
+
+    PostHog profiles are deleted and farewell emails sent only after the commit, so
+    nothing goes out for a deletion that didn't stick.
+
+    Args:
+        db: Database session holding the uncommitted deletions
+        deleted: (user_id, email, username, deletion_date, refund_amount) tuples
+    """
+    if not deleted:
+        return
+
+    db.commit()
+    logger.info(f"Committed deletion of {len(deleted)} accounts")
+
+    for user_id, email, username, deletion_date, refund_amount in deleted:
+        # PostHog person profile deletion (GDPR compliance)
+        schedule_posthog_person_deletion(user_id, email)
+
+        # Step 3: Send farewell email
+        try:
+            final_deletion_scheduled_email(
+                to_email=email,
+                username=username,
+                deletion_date=deletion_date.strftime("%B %d, %Y"),
+                refund_amount=refund_amount or 0
+            )
+            logger.info(f"Farewell email sent to {email}")
+        except Exception as e:
+            logger.error(f"Error sending farewell email to {email}: {e}")
+
 
 def process_scheduled_deletions():
     """
@@ -75,61 +162,52 @@ def process_scheduled_deletions():
         deletions = result.fetchall()
         logger.info(f"Found {len(deletions)} accounts to delete")
 
+        # Step 1: Process Stripe refunds (if applicable) for everyone up front, concurrently;
+        # the deletions below touch the local database, so they stay sequential
+        needs_refund = [
+            (user_id, deletion_date, stripe_customer_id, refund_amount)
+            for user_id, deletion_date, _, refund_amount, stripe_customer_id, _, _ in deletions
+            if stripe_customer_id and refund_amount and refund_amount > 0
+        ]
+        if needs_refund:
+            with ThreadPoolExecutor(max_workers=STRIPE_REFUND_WORKERS) as executor:
+                refunded = executor.map(lambda refund: process_refund(*refund), needs_refund)
+                for (user_id, _, _, _), was_refunded in zip(needs_refund, refunded):
+                    if was_refunded:
+                        record_refund(db, user_id)
+
+        deleted = []
         for deletion in deletions:
             user_id, deletion_date, deletion_type, refund_amount, stripe_customer_id, email, username = deletion
 
             logger.info(f"Processing deletion for user {user_id} ({username})")
 
             try:
-                # Step 1: Process Stripe refund (if applicable)
-                if stripe_customer_id and refund_amount and refund_amount > 0:
-                    logger.info(f"Processing refund of ${refund_amount} for user {user_id}")
-                    try:
-                        # Create refund for the customer
-                        # Note: This creates a refund for the most recent charge
-                        charges = stripe.Charge.list(customer=stripe_customer_id, limit=1)
-                        if charges.data:
-                            latest_charge = charges.data[0]
-                            refund = stripe.Refund.create(
-                                charge=latest_charge.id,
-                                amount=int(refund_amount * 100),  # Convert dollars to cents
-                                reason='requested_by_customer'
-                            )
-                            logger.info(f"Refund created: {refund.id}")
-                    except Exception as e:
-                        logger.error(f"Error processing refund for user {user_id}: {e}")
-                        # Continue with deletion even if refund fails
-
                 # Step 2: Delete all user data using centralized deletion utility
-                # This handles:
-                # - All database records (items, routines, chord charts, events, subscription, user)
-                # - PostHog person profile deletion (GDPR compliance)
+                # (all database records: items, routines, chord charts, events,
+                # subscription, user). A SAVEPOINT per user means a failure only undoes
+                # that user's deletion; the batch commit is left to finish_deletions().
                 logger.info(f"Deleting account for user {user_id} using delete_user_account() utility")
 
-                deletion_success = delete_user_account(db, user_id, email)
+                with db.begin_nested():
+                    deletion_success = delete_user_account(db, user_id, email, commit=False)
 
-                if not deletion_success:
-                    raise Exception(f"Account deletion failed for user {user_id}")
+                    if not deletion_success:
+                        raise Exception(f"Account deletion failed for user {user_id}")
 
                 logger.info(f"Successfully deleted all data for user {user_id}")
-
-                # Step 3: Send farewell email
-                try:
-                    final_deletion_scheduled_email(
-                        to_email=email,
-                        username=username,
-                        deletion_date=deletion_date.strftime("%B %d, %Y"),
-                        refund_amount=refund_amount or 0
-                    )
-                    logger.info(f"Farewell email sent to {email}")
-                except Exception as e:
-                    logger.error(f"Error sending farewell email to {email}: {e}")
+                deleted.append((user_id, email, username, deletion_date, refund_amount))
 
             except Exception as e:
                 logger.error(f"Error processing deletion for user {user_id}: {e}")
-                db.rollback()
                 # Continue to next deletion
 
+            if len(deleted) >= DELETION_COMMIT_BATCH:
+                finish_deletions(db, deleted)
+                deleted = []
+
+        finish_deletions(db, deleted)
+
         logger.info("Scheduled deletion processing complete")
 
     except Exception as e: